@@ -0,0 +1,71 @@
+"""
+Benchmark for building MovieRecord, SeriesRecord and ArtistRecord objects
+from TMDB detail payloads.
+
+Usage:
+    python -m benchmarks.bench_records [num_records]
+"""
+import sys
+import time
+import tracemalloc
+
+from mf_representations.records import MovieRecord, SeriesRecord, ArtistRecord
+
+MOVIE_PAYLOAD = {
+    "id": 603,
+    "title": "The Matrix",
+    "original_title": "The Matrix",
+    "popularity": 81.5,
+    "vote_average": 8.2,
+    "vote_count": 24000,
+    "release_date": "1999-03-30",
+    "runtime": 136,
+    "genres": [{"id": 28, "name": "Action"}, {"id": 878, "name": "Science Fiction"}],
+    "production_companies": [
+        {"id": 79, "name": "Village Roadshow Pictures", "origin_country": "US"},
+        {"id": 372, "name": "Groucho II Film Partnership", "origin_country": ""},
+    ],
+    "spoken_languages": [{"iso_639_1": "en", "name": "English"}],
+}
+SERIES_PAYLOAD = {
+    "id": 1399,
+    "name": "Game of Thrones",
+    "popularity": 369.6,
+    "first_air_date": "2011-04-17",
+    "last_air_date": "2019-05-19",
+    "genres": [{"id": 18, "name": "Drama"}],
+    "networks": [{"id": 49, "name": "HBO"}],
+    "seasons": [{"season_number": number, "episode_count": 10} for number in range(1, 9)],
+}
+ARTIST_PAYLOAD = {
+    "id": 6384,
+    "name": "Keanu Reeves",
+    "popularity": 45.2,
+    "also_known_as": ["Keanu Charles Reeves"],
+    "birthday": "1964-09-02",
+}
+
+
+def bench(record_class, payload, num_records: int) -> None:
+    start_time = time.perf_counter()
+    records = [record_class(**payload) for _ in range(num_records)]
+    elapsed_sec = time.perf_counter() - start_time
+    del records
+
+    # Memory is traced in a separate pass, since tracing slows down construction
+    tracemalloc.start()
+    records = [record_class(**payload) for _ in range(min(num_records, 10_000))]
+    memory_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    print(
+        f"{record_class.__name__:>13}: {num_records} records in {elapsed_sec:.3f} s "
+        f"({num_records / elapsed_sec:,.0f} records/s), "
+        f"{memory_bytes / len(records):,.0f} bytes/record"
+    )
+
+
+if __name__ == "__main__":
+    num_records = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    bench(MovieRecord, MOVIE_PAYLOAD, num_records)
+    bench(SeriesRecord, SERIES_PAYLOAD, num_records)
+    bench(ArtistRecord, ARTIST_PAYLOAD, num_records)
@@ -0,0 +1,324 @@
+import sqlite3
+import threading
+import time
+
+from pathlib import Path
+from typing import Dict, Any, List, Tuple, Iterable
+
+from mf_representations.enums import (
+    RecordType,
+    PlatformType,
+    RapidPlatformInfoCountry,
+    AvailabilityTable,
+)
+
+
+class AvailabilityStore:
+    """
+    Local SQLite store of platform availability, filled from RapidAPI results,
+    so that availability lookups do not need a live RapidAPI call. Every
+    thread uses its own connection, and WAL mode lets all server workers
+    read the same file concurrently.
+    """
+
+    # SQLite limits the number of bound parameters per statement
+    MAX_KEYS_PER_QUERY = 400
+
+    def __init__(self, file_name: Path) -> None:
+        self.file_name = Path(file_name)
+        self._local = threading.local()
+        connection = self._get_connection()
+        connection.executescript(
+            """
+            PRAGMA journal_mode=WAL;
+            CREATE TABLE IF NOT EXISTS availability (
+                tmdb_id INTEGER NOT NULL,
+                type TEXT NOT NULL,
+                country TEXT NOT NULL,
+                platform TEXT NOT NULL,
+                link TEXT,
+                added INTEGER,
+                leaving INTEGER,
+                PRIMARY KEY (tmdb_id, type, country, platform)
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS availability_refresh (
+                tmdb_id INTEGER NOT NULL,
+                type TEXT NOT NULL,
+                country TEXT NOT NULL,
+                refreshed_at REAL NOT NULL,
+                PRIMARY KEY (tmdb_id, type, country)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS availability_by_leaving
+                ON availability (platform, country, leaving) WHERE leaving IS NOT NULL;
+            CREATE INDEX IF NOT EXISTS availability_by_added
+                ON availability (platform, country, added) WHERE added IS NOT NULL;
+            """
+        )
+
+    def _get_connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.file_name)
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def merge_availability_table(
+        self,
+        table: AvailabilityTable,
+        refreshed_keys: Iterable[Tuple[int, RecordType, str]] = (),
+        refreshed_at: float = None,
+    ) -> None:
+        """
+        Replaces the stored availability of every (title, country) pair of the
+        table in a single transaction. Pairs in refreshed_keys without any rows
+        in the table are stored as not available on any platform.
+
+        Args:
+            table (AvailabilityTable): Columnar availability rows
+            refreshed_keys (Iterable[Tuple[int, RecordType, str]], optional):
+                Additional (tmdb_id, record type, country) keys that were fetched.
+            refreshed_at (float, optional): Epoch time of the fetch. Defaults to time.time().
+        """
+        record_types = list(RecordType)
+        platforms = list(PlatformType)
+        type_names = [record_types[code].name for code in table.record_types.tolist()]
+        rows = [
+            (tmdb_id, type_name, country, platforms[platform].value, link, added, leaving)
+            for tmdb_id, type_name, country, platform, link, added, leaving in zip(
+                table.tmdb_ids.tolist(),
+                type_names,
+                table.countries.tolist(),
+                table.platforms.tolist(),
+                table.links,
+                table.added.tolist(),
+                table.leaving.tolist(),
+            )
+        ]
+        keys = dict.fromkeys(
+            (tmdb_id, record_type.name, country) for tmdb_id, record_type, country in refreshed_keys
+        )
+        keys.update(dict.fromkeys(row[:3] for row in rows))
+        refreshed_at = time.time() if refreshed_at is None else refreshed_at
+
+        connection = self._get_connection()
+        with connection:
+            connection.executemany(
+                "DELETE FROM availability WHERE tmdb_id = ? AND type = ? AND country = ?",
+                keys,
+            )
+            connection.executemany(
+                "INSERT INTO availability VALUES (?, ?, ?, ?, ?, NULLIF(?, 0), NULLIF(?, 0))",
+                rows,
+            )
+            connection.executemany(
+                "INSERT OR REPLACE INTO availability_refresh VALUES (?, ?, ?, ?)",
+                [key + (refreshed_at,) for key in keys],
+            )
+
+    def put_platform_info(
+        self,
+        tmdb_id: int,
+        record_type: RecordType,
+        country: str,
+        platform_info: RapidPlatformInfoCountry,
+        refreshed_at: float = None,
+    ) -> None:
+        """
+        Replaces the stored availability of a title in the requested country,
+        and in every other country included in the RapidAPI result
+
+        Args:
+            tmdb_id (int): TMDB id of the title
+            record_type (RecordType): Record type of the title
+            country (str): Country code of the request
+            platform_info (RapidPlatformInfoCountry): RapidAPI result
+            refreshed_at (float, optional): Epoch time of the fetch. Defaults to time.time().
+        """
+        table = AvailabilityTable.from_streaming_info(
+            platform_info.streaming_info, tmdb_id=tmdb_id, record_type=record_type
+        )
+        self.merge_availability_table(
+            table, refreshed_keys=[(tmdb_id, record_type, country)], refreshed_at=refreshed_at
+        )
+
+    def get_refresh_state(
+        self, tmdb_id: int, record_type: RecordType, country: str, now: float = None
+    ) -> Tuple[float, int]:
+        """
+        Looks up when a title was last refreshed in a country, and the earliest
+        known leaving time of the title on any platform there after now
+
+        Args:
+            tmdb_id (int): TMDB id of the title
+            record_type (RecordType): Record type of the title
+            country (str): Country code
+            now (float, optional): Current epoch time. Defaults to time.time().
+
+        Returns:
+            Tuple[float, int]: Refresh time and earliest leaving time in epoch
+                seconds, either of which is None if unknown
+        """
+        now = time.time() if now is None else now
+        connection = self._get_connection()
+        refreshed = connection.execute(
+            "SELECT refreshed_at FROM availability_refresh "
+            "WHERE tmdb_id = ? AND type = ? AND country = ?",
+            (tmdb_id, record_type.name, country),
+        ).fetchone()
+        (leaving,) = connection.execute(
+            "SELECT MIN(leaving) FROM availability "
+            "WHERE tmdb_id = ? AND type = ? AND country = ? AND leaving >= ?",
+            (tmdb_id, record_type.name, country, int(now)),
+        ).fetchone()
+        return (refreshed[0] if refreshed else None), leaving
+
+    def get_many(
+        self, keys: Iterable[Tuple[int, RecordType]], country: str
+    ) -> Tuple[Dict[Tuple[int, RecordType], List[Dict[str, Any]]], List[Tuple[int, RecordType]]]:
+        """
+        Looks up the availability of many titles in a country
+
+        Args:
+            keys (Iterable[Tuple[int, RecordType]]): (tmdb_id, record type) pairs
+            country (str): Country code
+
+        Returns:
+            Tuple[Dict, List]: Platform links of every stored title, and the
+                keys that have never been fetched
+        """
+        keys = list(dict.fromkeys(keys))
+        connection = self._get_connection()
+        platforms = {key: [] for key in keys}
+        refreshed_keys = set()
+        for start in range(0, len(keys), self.MAX_KEYS_PER_QUERY):
+            key_batch = keys[start : start + self.MAX_KEYS_PER_QUERY]
+            values = ", ".join(["(?, ?)"] * len(key_batch))
+            parameters = [country]
+            for tmdb_id, record_type in key_batch:
+                parameters.extend((tmdb_id, record_type.name))
+            for tmdb_id, type_name in connection.execute(
+                f"SELECT tmdb_id, type FROM availability_refresh "
+                f"WHERE country = ? AND (tmdb_id, type) IN (VALUES {values})",
+                parameters,
+            ):
+                refreshed_keys.add((tmdb_id, RecordType[type_name]))
+            for tmdb_id, type_name, platform, link, added, leaving in connection.execute(
+                f"SELECT tmdb_id, type, platform, link, added, leaving FROM availability "
+                f"WHERE country = ? AND (tmdb_id, type) IN (VALUES {values})",
+                parameters,
+            ):
+                platforms[(tmdb_id, RecordType[type_name])].append(
+                    {"platform": platform, "link": link, "added": added, "leaving": leaving}
+                )
+        missing_keys = [key for key in keys if key not in refreshed_keys]
+        for key in missing_keys:
+            del platforms[key]
+        return platforms, missing_keys
+
+    @staticmethod
+    def _parse_cursor(cursor: str) -> Tuple[int, int, str]:
+        value, tmdb_id, type_name = cursor.split(":")
+        return int(value), int(tmdb_id), RecordType[type_name].name
+
+    def _get_time_range(
+        self,
+        column: str,
+        platform: PlatformType,
+        country: str,
+        start: int,
+        end: int,
+        limit: int,
+        cursor: str,
+        descending: bool,
+    ) -> Tuple[List[Dict[str, Any]], str]:
+        # Rows are ordered by (column, tmdb_id, type), which is exactly the order of
+        # the partial indexes, so pages are read off the index without sorting.
+        # The cursor is the sort key of the last returned row.
+        if limit < 1:
+            raise ValueError(f"Page size must be positive, got {limit}")
+        order, compare = ("DESC", "<") if descending else ("ASC", ">")
+        query = (
+            f"SELECT tmdb_id, type, link, added, leaving FROM availability "
+            f"WHERE platform = ? AND country = ? AND {column} >= ? AND {column} < ?"
+        )
+        parameters = [platform.value, country, start, end]
+        if cursor:
+            query += f" AND ({column}, tmdb_id, type) {compare} (?, ?, ?)"
+            parameters.extend(self._parse_cursor(cursor))
+        query += f" ORDER BY {column} {order}, tmdb_id {order}, type {order} LIMIT ?"
+        parameters.append(limit + 1)
+
+        rows = self._get_connection().execute(query, parameters).fetchall()
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            tmdb_id, type_name, _, added, leaving = rows[-1]
+            value = added if column == "added" else leaving
+            next_cursor = f"{value}:{tmdb_id}:{type_name}"
+        return [
+            {
+                "tmdb_id": tmdb_id,
+                "type": RecordType[type_name],
+                "link": link,
+                "added": added,
+                "leaving": leaving,
+            }
+            for tmdb_id, type_name, link, added, leaving in rows
+        ], next_cursor
+
+    def get_leaving(
+        self,
+        platform: PlatformType,
+        country: str,
+        start: int,
+        end: int,
+        limit: int = 50,
+        cursor: str = None,
+    ) -> Tuple[List[Dict[str, Any]], str]:
+        """
+        Titles leaving a platform in a country within [start, end), soonest first
+
+        Args:
+            platform (PlatformType): Streaming platform
+            country (str): Country code
+            start (int): Start of the range in epoch seconds
+            end (int): End of the range in epoch seconds, exclusive
+            limit (int, optional): Page size. Defaults to 50.
+            cursor (str, optional): Cursor returned with the previous page. Defaults to None.
+
+        Returns:
+            Tuple[List[Dict], str]: Rows of the page, and the cursor of the next
+                page or None if this is the last one
+        """
+        return self._get_time_range(
+            "leaving", platform, country, start, end, limit, cursor, descending=False
+        )
+
+    def get_added(
+        self,
+        platform: PlatformType,
+        country: str,
+        start: int,
+        end: int,
+        limit: int = 50,
+        cursor: str = None,
+    ) -> Tuple[List[Dict[str, Any]], str]:
+        """
+        Titles added to a platform in a country within [start, end), latest first
+
+        Args:
+            platform (PlatformType): Streaming platform
+            country (str): Country code
+            start (int): Start of the range in epoch seconds
+            end (int): End of the range in epoch seconds, exclusive
+            limit (int, optional): Page size. Defaults to 50.
+            cursor (str, optional): Cursor returned with the previous page. Defaults to None.
+
+        Returns:
+            Tuple[List[Dict], str]: Rows of the page, and the cursor of the next
+                page or None if this is the last one
+        """
+        return self._get_time_range(
+            "added", platform, country, start, end, limit, cursor, descending=True
+        )
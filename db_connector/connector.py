@@ -1,12 +1,67 @@
 import abc
+import time
+import threading
+import requests
+
+from typing import Dict, Tuple
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from mf_representations.enums import UpstreamType
+from mf_utils.rate_limiter import TokenBucket, get_rate_limiter
+
+
+def generate_http_session(
+    pool_size: int = 10,
+    max_retries: int = 3,
+    backoff_factor: float = 0.5,
+    retry_statuses: Tuple[int] = (500, 502, 503, 504),
+) -> requests.Session:
+    """
+    Function for creating a pooled keep-alive HTTP session that retries
+    with exponential backoff on 5xx responses. 429 responses are returned
+    to the caller, so that the shared rate limiter can back off on them.
+
+    Args:
+        pool_size (int, optional): Maximum number of kept-alive connections per host.
+            Defaults to 10.
+        max_retries (int, optional): Maximum number of retries. Defaults to 3.
+        backoff_factor (float, optional): Exponential backoff factor in seconds.
+            Defaults to 0.5.
+        retry_statuses (Tuple[int], optional): Response statuses to retry.
+            Defaults to (500, 502, 503, 504).
+
+    Returns:
+        requests.Session: HTTP session
+    """
+    retry = Retry(
+        total=max_retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=retry_statuses,
+        # Otherwise urllib3 also retries 429 responses that carry a Retry-After header
+        respect_retry_after_header=False,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
 
 
 class ConnectorBase(abc.ABC):
     """
     Connector base class. From this base, we will
-    connector objects for TMDB, Supabase, and RapidApi
+    connector objects for TMDB, Supabase, and RapidApi.
+    All connectors of the same class share one pooled HTTP session.
     """
 
+    _sessions: Dict[type, requests.Session] = {}
+    _sessions_lock = threading.Lock()
+
+    # Number of requests sent by _request, including the retries of 429 responses
+    num_http_requests = 0
+
     @classmethod
     @abc.abstractproperty
     def AUTH_TOKEN(cls) -> str:
@@ -17,5 +72,78 @@ class ConnectorBase(abc.ABC):
     def URL_BASE(cls) -> str:
         pass
 
+    @property
+    def UPSTREAM(cls) -> UpstreamType:
+        # Upstream whose shared rate limit the requests are acquired from
+        return None
+
+    @property
+    def HTTP_POOL_SIZE(cls) -> int:
+        return 10
+
+    @property
+    def HTTP_MAX_RETRIES(cls) -> int:
+        return 3
+
+    @property
+    def HTTP_BACKOFF_FACTOR(cls) -> float:
+        return 0.5
+
+    @property
+    def HTTP_RETRY_STATUSES(cls) -> Tuple[int]:
+        return (500, 502, 503, 504)
+
+    @property
+    def HTTP_TIMEOUT(cls) -> Tuple[float, float]:
+        # (connect timeout, read timeout) in seconds
+        return (3.05, 30)
+
     def __init__(self) -> None:
         super().__init__()
+
+    @property
+    def session(self) -> requests.Session:
+        session = ConnectorBase._sessions.get(type(self))
+        if session is None:
+            with ConnectorBase._sessions_lock:
+                session = ConnectorBase._sessions.get(type(self))
+                if session is None:
+                    session = generate_http_session(
+                        pool_size=self.HTTP_POOL_SIZE,
+                        max_retries=self.HTTP_MAX_RETRIES,
+                        backoff_factor=self.HTTP_BACKOFF_FACTOR,
+                        retry_statuses=self.HTTP_RETRY_STATUSES,
+                    )
+                    ConnectorBase._sessions[type(self)] = session
+        return session
+
+    @property
+    def rate_limiter(self) -> TokenBucket:
+        if self.UPSTREAM is None:
+            return None
+        return get_rate_limiter(self.UPSTREAM)
+
+    def _request(self, method: str, url: str, **kwargs) -> requests.Response:
+        """
+        Makes a request within the shared rate limit of the upstream. A 429
+        response pauses the shared bucket by its Retry-After header, or by an
+        exponential backoff without one, so that every thread backs off, and
+        the request is retried up to HTTP_MAX_RETRIES times.
+        """
+        kwargs.setdefault("timeout", self.HTTP_TIMEOUT)
+        rate_limiter = self.rate_limiter
+        for attempt in range(self.HTTP_MAX_RETRIES + 1):
+            if rate_limiter is not None:
+                rate_limiter.acquire()
+            self.num_http_requests += 1
+            response = self.session.request(method, url, **kwargs)
+            if rate_limiter is not None:
+                rate_limiter.update_from_headers(response.status_code, response.headers)
+            if response.status_code != 429 or attempt == self.HTTP_MAX_RETRIES:
+                return response
+            response.close()
+            backoff = self.HTTP_BACKOFF_FACTOR * 2**attempt
+            if rate_limiter is None:
+                time.sleep(backoff)
+            elif "Retry-After" not in response.headers:
+                rate_limiter.pause(backoff)
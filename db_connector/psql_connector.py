@@ -1,18 +1,38 @@
 import ipdb
 import abc
 import os
+import time
+import itertools
+import functools
+import threading
+import httpx
 import supabase
 
-from typing import Dict, Any, List
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, Future, wait
+from postgrest.exceptions import APIError
+from typing import Dict, Any, List, Iterable, Iterator, Tuple
 
-from mf_representations.enums import RecordType, SupaMainData
+from mf_representations.enums import (
+    RecordType,
+    UpstreamType,
+    SupaMainData,
+    SupaBatchResult,
+    SupaBulkReport,
+    IngestSummary,
+)
 from db_connector.connector import ConnectorBase
-from db_connector.tmdb_connector import TmdbConnector
+from db_connector.tmdb_connector import TmdbConnector, TmdbExporter
 from mf_utils import logger_setup
+from mf_utils.existence_index import ExistenceIndex
+from mf_utils.checkpoint import IngestCheckpoint
 import logging
 
 logger = logger_setup.get_logger("supa_main_logger", "main_data_update_logs.txt")
 
+# API errors of PostgREST, and transport errors (timeouts, connection errors) of its client
+SUPA_REQUEST_ERRORS = (APIError, httpx.HTTPError)
+
 
 class SupaConnector(ConnectorBase):
     @abc.abstractproperty
@@ -31,10 +51,19 @@ class SupaConnector(ConnectorBase):
     def PROJECT_PASSWORD(cls) -> str:
         return os.environ.get("SUPA_DB_KEY")
 
+    @property
+    def UPSTREAM(cls) -> UpstreamType:
+        return UpstreamType.SUPABASE
+
     @abc.abstractmethod
     def generate_supa_client(self) -> bool:
         pass
 
+    def _execute(self, query: Any) -> Any:
+        # All queries acquire from the Supabase rate limit shared across connectors
+        self.rate_limiter.acquire()
+        return query.execute()
+
     def __init__(self) -> None:
         self.generate_supa_client()
 
@@ -49,46 +78,191 @@ class SupaTmdbConnector(SupaConnector):
         column_list = ["tmdb_id", "title", "type", "popularity"]
         return column_list
 
-    def __init__(self) -> None:
+    @property
+    def UPSERT_BATCH_SIZE(cls) -> int:
+        return 1000
+
+    @property
+    def UPSERT_CONFLICT_COLUMNS(cls) -> str:
+        return "tmdb_id,type"
+
+    @property
+    def EXISTENCE_INDEX_PAGE_SIZE(cls) -> int:
+        return 1000
+
+    @property
+    def CHECKPOINT_FILE_NAME(cls) -> Path:
+        return Path(__file__).parent.resolve() / "ingest_checkpoint.json"
+
+    def __init__(self, use_existence_index: bool = True) -> None:
         super().__init__()
         self.generate_tmdb_client()
+        self.generate_ingest_checkpoint()
+        self.existence_index = None
+        if use_existence_index:
+            self.generate_existence_index()
 
     @classmethod
     def generate_tmdb_client(cls) -> bool:
         cls.tmdb_connector = TmdbConnector()
+        cls.tmdb_exporter = TmdbExporter()
         return True
 
     def generate_supa_client(self) -> bool:
         self.client = supabase.create_client(self.URL_BASE, self.AUTH_TOKEN)
-        self.client.table(self.TABLE_NAME).select("*").limit(1).execute()
+        self._execute(self.client.table(self.TABLE_NAME).select("*").limit(1))
+        return True
+
+    def generate_ingest_checkpoint(self) -> bool:
+        self.ingest_checkpoint = IngestCheckpoint(self.CHECKPOINT_FILE_NAME)
+        return True
+
+    def _iter_existing_tmdb_ids(self, record_type: RecordType) -> Iterator[int]:
+        # Keyset pagination over tmdb_id keeps every page an index range scan
+        last_tmdb_id = -1
+        while True:
+            response = self._execute(
+                self.client.table(self.TABLE_NAME)
+                .select("tmdb_id")
+                .eq("type", record_type.name)
+                .gt("tmdb_id", last_tmdb_id)
+                .order("tmdb_id")
+                .limit(self.EXISTENCE_INDEX_PAGE_SIZE)
+            )
+            for item in response.data:
+                yield item["tmdb_id"]
+            if len(response.data) < self.EXISTENCE_INDEX_PAGE_SIZE:
+                break
+            last_tmdb_id = response.data[-1]["tmdb_id"]
+
+    def generate_existence_index(self) -> bool:
+        """
+        Reads all existing (tmdb_id, type) pairs of the main table into a local
+        index, so that existence checks do not need a remote query
+        """
+        logger.log(level=logging.INFO, msg="Generating the existence index...")
+        self.existence_index = ExistenceIndex()
+        for record_type in (RecordType.MOVIE, RecordType.SERIES, RecordType.ARTIST):
+            self.existence_index.bulk_load(record_type, self._iter_existing_tmdb_ids(record_type))
+        logger.log(
+            level=logging.INFO,
+            msg=f"Existence index generated with {len(self.existence_index)} records!",
+        )
         return True
 
     def _insert_tmdb_data(self, data_record: SupaMainData) -> bool:
-        response = self.client.table(self.TABLE_NAME).insert(data_record._to_dict()).execute()
+        response = self._execute(self.client.table(self.TABLE_NAME).insert(data_record._to_dict()))
+        if len(response.data) > 0 and self.existence_index is not None:
+            self.existence_index.add(data_record.type, data_record.tmdb_id)
         return len(response.data) > 0
 
+    def _upsert_tmdb_batch(self, data_records: List[SupaMainData]) -> int:
+        # Postgres rejects an upsert that touches the same row twice,
+        # so duplicate keys within a batch are collapsed, keeping the last one
+        unique_records = {(record.tmdb_id, record.type): record for record in data_records}
+        response = self._execute(
+            self.client.table(self.TABLE_NAME).upsert(
+                [record._to_dict() for record in unique_records.values()],
+                on_conflict=self.UPSERT_CONFLICT_COLUMNS,
+            )
+        )
+        if self.existence_index is not None:
+            for record in response.data:
+                self.existence_index.add(RecordType[record["type"]], record["tmdb_id"])
+        return len(response.data) + len(data_records) - len(unique_records)
+
+    @staticmethod
+    def _batched(items: Iterable[Any], batch_size: int) -> Iterator[List[Any]]:
+        iterator = iter(items)
+        while batch := list(itertools.islice(iterator, batch_size)):
+            yield batch
+
+    def bulk_upsert_tmdb_data(
+        self, data_records: Iterable[SupaMainData], batch_size: int = None
+    ) -> SupaBulkReport:
+        """
+        Upserts the records in batches, one request per batch, resolving
+        conflicts on (tmdb_id, type). Failed batches are logged and counted
+        instead of aborting the run.
+
+        Args:
+            data_records (Iterable[SupaMainData]): Records to upsert
+            batch_size (int, optional): Number of records per request.
+                Defaults to UPSERT_BATCH_SIZE.
+
+        Returns:
+            SupaBulkReport: Per-batch success and failure counts
+        """
+        batch_size = batch_size or self.UPSERT_BATCH_SIZE
+        report = SupaBulkReport()
+        for batch_index, batch in enumerate(self._batched(data_records, batch_size)):
+            report.batches.append(self._upsert_tmdb_batch_with_result(batch_index, batch))
+        return report
+
+    def _upsert_tmdb_batch_with_result(
+        self, batch_index: int, batch: List[SupaMainData]
+    ) -> SupaBatchResult:
+        start_time = time.perf_counter()
+        try:
+            num_succeeded = self._upsert_tmdb_batch(batch)
+            error = None
+        except SUPA_REQUEST_ERRORS as e:
+            num_succeeded = 0
+            error = f"{e.__class__.__name__}: {e}"
+            logger.log(
+                level=logging.ERROR,
+                msg=f"Failed to upsert batch {batch_index} of {len(batch)} records: {error}",
+            )
+        return SupaBatchResult(
+            batch_index=batch_index,
+            num_records=len(batch),
+            num_succeeded=num_succeeded,
+            num_failed=len(batch) - num_succeeded,
+            elapsed_sec=time.perf_counter() - start_time,
+            error=error,
+        )
+
     def _update_tmdb_data(self, unique_id: int, data_record: SupaMainData) -> bool:
-        ipdb.set_trace()
-        response = (
+        response = self._execute(
             self.client.table(self.TABLE_NAME)
             .update(data_record._to_dict())
             .eq("unique_id", unique_id)
-            .execute()
         )
         return len(response.data) > 0
 
     def _update_existing_tmdb_data(self, data_record: SupaMainData) -> bool:
-        pass
+        response = self._execute(
+            self.client.table(self.TABLE_NAME)
+            .update(data_record._to_dict())
+            .eq("tmdb_id", data_record.tmdb_id)
+            .eq("type", data_record.type.name)
+        )
+        return len(response.data) > 0
 
-    def _check_data_exists(self, data_record: SupaMainData) -> bool:
-        # check if data exists
-        type_response = (
+    def _delete_tmdb_data(self, data_record: SupaMainData) -> bool:
+        response = self._execute(
             self.client.table(self.TABLE_NAME)
-            .select("*")
+            .delete()
             .eq("tmdb_id", data_record.tmdb_id)
             .eq("type", data_record.type.name)
-        ).execute()
-        if len(type_response.data) > 0:
+        )
+        if self.existence_index is not None:
+            self.existence_index.remove(data_record.type, data_record.tmdb_id)
+        return len(response.data) > 0
+
+    def _check_data_exists(self, data_record: SupaMainData) -> bool:
+        # check if data exists, locally if the existence index is available
+        if self.existence_index is not None:
+            data_exists = (data_record.tmdb_id, data_record.type) in self.existence_index
+        else:
+            type_response = self._execute(
+                self.client.table(self.TABLE_NAME)
+                .select("tmdb_id")
+                .eq("tmdb_id", data_record.tmdb_id)
+                .eq("type", data_record.type.name)
+            )
+            data_exists = len(type_response.data) > 0
+        if data_exists:
             logger.log(
                 level=logging.INFO, msg=f"Tried to insert existing data: {data_record._to_dict()}."
             )
@@ -98,59 +272,295 @@ class SupaTmdbConnector(SupaConnector):
     def _supa_main_to_data_record(self, data_dict: Dict[str, Any]):
         return SupaMainData(
             tmdb_id=data_dict["tmdb_id"],
-            type=RecordType(data_dict["type"]),
-            title=data_dict["title"],
-            popularity=data_dict["popularity"],
+            type=RecordType[data_dict["type"]],
+            title=data_dict.get("title"),
+            popularity=data_dict.get("popularity"),
         )
 
-    def insert_tmdb_daily_export_movies(self) -> bool:
-        logger.log(level=logging.INFO, msg="Inserting all TMDB movie data...")
-        for item in self.tmdb_connector.get_all_movie_id_titles():
-            supa_main_data_record = SupaMainData(
-                tmdb_id=int(item["tmdb_id"]),
-                type=RecordType.MOVIE,
-                title=item["title"],
-                popularity=item["popularity"],
+    def _iter_tmdb_daily_export_records(
+        self, record_type: RecordType, start_offset: int = 0
+    ) -> Iterator[SupaMainData]:
+        rows = self.tmdb_exporter.iter_tmdb_daily_export(
+            record_type, export_date=self.ingest_checkpoint.export_date
+        )
+        for row in itertools.islice(rows, start_offset, None):
+            yield SupaMainData(
+                tmdb_id=row.tmdb_id,
+                type=row.type,
+                title=row.title,
+                popularity=row.popularity,
             )
-            if not self._check_data_exists(supa_main_data_record):
-                assert self._insert_tmdb_data(
-                    supa_main_data_record
-                ), f"Failed to insert the MOVIE data: {supa_main_data_record._to_dict()}"
-        logger.log(level=logging.INFO, msg="All TMDB movie data inserted!")
-
-    def insert_tmdb_daily_export_series(self) -> bool:
-        for item in next(self.tmdb_connector.get_all_series_id_titles()):
-            supa_main_data_record = SupaMainData(
-                tmdb_id=int(item["tmdb_id"]),
-                type=RecordType.SERIES,
-                title=item["title"],
-                popularity=item["popularity"],
+
+    def _insert_tmdb_daily_export(self, record_type: RecordType, batch_size: int = None) -> bool:
+        if self.ingest_checkpoint.is_completed(record_type):
+            logger.log(level=logging.INFO, msg=f"TMDB {record_type.name} data already inserted.")
+            return True
+        start_offset = self.ingest_checkpoint.get_offset(record_type)
+        logger.log(
+            level=logging.INFO,
+            msg=f"Inserting all TMDB {record_type.name} data from offset {start_offset}...",
+        )
+        records = self._iter_tmdb_daily_export_records(record_type, start_offset)
+        offset = start_offset
+        if batch_size is not None:
+            report = SupaBulkReport()
+            for batch_index, batch in enumerate(self._batched(records, batch_size)):
+                result = self._upsert_tmdb_batch_with_result(batch_index, batch)
+                report.batches.append(result)
+                if result.error is None:
+                    self.ingest_checkpoint.commit(
+                        record_type, offset, offset + len(batch), batch[-1].tmdb_id
+                    )
+                offset += len(batch)
+            logger.log(
+                level=logging.INFO,
+                msg=f"TMDB {record_type.name} data upserted: {report.num_succeeded} succeeded, "
+                f"{report.num_failed} failed, {report.records_per_sec:.1f} records/sec.",
             )
-            if not self._check_data_exists(supa_main_data_record):
-                assert self._insert_tmdb_data(
-                    supa_main_data_record
-                ), f"Failed to insert the SERIES data: {supa_main_data_record._to_dict()}"
-
-    def insert_tmdb_daily_export_artist(self) -> bool:
-        for item in next(self.tmdb_connector.get_all_artist_id_titles()):
-            supa_main_data_record = SupaMainData(
-                tmdb_id=int(item["tmdb_id"]),
-                type=RecordType.ARTIST,
-                title=item["title"],
-                popularity=item["popularity"],
+            if any(result.error is not None for result in report.batches):
+                return False
+            self.ingest_checkpoint.complete(record_type)
+            return True
+        for batch in self._batched(records, self.UPSERT_BATCH_SIZE):
+            for supa_main_data_record in batch:
+                if not self._check_data_exists(supa_main_data_record):
+                    assert self._insert_tmdb_data(
+                        supa_main_data_record
+                    ), f"Failed to insert the {record_type.name} data: {supa_main_data_record._to_dict()}"
+            self.ingest_checkpoint.commit(
+                record_type, offset, offset + len(batch), batch[-1].tmdb_id
             )
-            if not self._check_data_exists(supa_main_data_record):
-                assert self._insert_tmdb_data(
-                    supa_main_data_record
-                ), f"Failed to insert the ARTIST data: {supa_main_data_record._to_dict()}"
+            offset += len(batch)
+        self.ingest_checkpoint.complete(record_type)
+        logger.log(level=logging.INFO, msg=f"All TMDB {record_type.name} data inserted!")
+        return True
+
+    def insert_tmdb_daily_export_movies(self, batch_size: int = None) -> bool:
+        return self._insert_tmdb_daily_export(RecordType.MOVIE, batch_size=batch_size)
+
+    def insert_tmdb_daily_export_series(self, batch_size: int = None) -> bool:
+        return self._insert_tmdb_daily_export(RecordType.SERIES, batch_size=batch_size)
+
+    def insert_tmdb_daily_export_artist(self, batch_size: int = None) -> bool:
+        return self._insert_tmdb_daily_export(RecordType.ARTIST, batch_size=batch_size)
 
-    def insert_all_tmdb_data(self) -> bool:
-        assert self.insert_tmdb_daily_export_movies(), "Daily export movie insert error"
-        assert self.insert_tmdb_daily_export_artist(), "Daily export series insert error"
-        assert self.insert_tmdb_daily_export_artist(), "Daily export artists insert error"
+    def insert_all_tmdb_data(self, batch_size: int = None) -> bool:
+        assert self.insert_tmdb_daily_export_movies(batch_size), "Daily export movie insert error"
+        assert self.insert_tmdb_daily_export_series(batch_size), "Daily export series insert error"
+        assert self.insert_tmdb_daily_export_artist(batch_size), "Daily export artists insert error"
+        return True
+
+    def _on_concurrent_batch_done(
+        self,
+        record_type: RecordType,
+        batch_index: int,
+        start_offset: int,
+        num_records: int,
+        last_tmdb_id: int,
+        results: List[SupaBatchResult],
+        pending: set,
+        lock: threading.Lock,
+        in_flight: threading.BoundedSemaphore,
+        future: Future,
+    ) -> None:
+        # Only plain values are bound to the callback, since a Future keeps its
+        # callbacks alive, and binding the batch would keep the whole export in memory
+        try:
+            if future.exception() is None:
+                result = future.result()
+            else:
+                result = SupaBatchResult(
+                    batch_index=batch_index,
+                    num_records=num_records,
+                    num_succeeded=0,
+                    num_failed=num_records,
+                    elapsed_sec=0.0,
+                    error=f"{future.exception().__class__.__name__}: {future.exception()}",
+                )
+            if result.error is None:
+                self.ingest_checkpoint.commit(
+                    record_type, start_offset, start_offset + num_records, last_tmdb_id
+                )
+            with lock:
+                results.append(result)
+                pending.discard(future)
+        finally:
+            in_flight.release()
+
+    def _ingest_tmdb_daily_export_concurrent(
+        self,
+        record_type: RecordType,
+        executor: ThreadPoolExecutor,
+        in_flight: threading.BoundedSemaphore,
+        batch_size: int,
+    ) -> Tuple[SupaBulkReport, float]:
+        # Streams the export and hands every batch, i.e. a contiguous id range
+        # of the export, to the shared worker pool. The semaphore caps the
+        # number of in-flight requests across all record types, and finished
+        # futures are dropped, so memory stays flat over the export.
+        start_time = time.perf_counter()
+        if self.ingest_checkpoint.is_completed(record_type):
+            return SupaBulkReport(), time.perf_counter() - start_time
+        offset = self.ingest_checkpoint.get_offset(record_type)
+        results: List[SupaBatchResult] = []
+        pending = set()
+        lock = threading.Lock()
+        for batch_index, batch in enumerate(
+            self._batched(self._iter_tmdb_daily_export_records(record_type, offset), batch_size)
+        ):
+            in_flight.acquire()
+            future = executor.submit(self._upsert_tmdb_batch_with_result, batch_index, batch)
+            with lock:
+                pending.add(future)
+            future.add_done_callback(
+                functools.partial(
+                    self._on_concurrent_batch_done,
+                    record_type,
+                    batch_index,
+                    offset,
+                    len(batch),
+                    batch[-1].tmdb_id,
+                    results,
+                    pending,
+                    lock,
+                    in_flight,
+                )
+            )
+            offset += len(batch)
+        with lock:
+            remaining = list(pending)
+        wait(remaining)
+        report = SupaBulkReport(
+            batches=sorted(results, key=lambda result: result.batch_index)
+        )
+        if all(result.error is None for result in report.batches):
+            self.ingest_checkpoint.complete(record_type)
+        return report, time.perf_counter() - start_time
+
+    def insert_all_tmdb_data_concurrent(
+        self, batch_size: int = None, max_workers: int = 8, max_in_flight: int = 8
+    ) -> IngestSummary:
+        """
+        Ingests the movie, series and artist exports concurrently. Every export
+        is streamed by its own producer thread, while the upsert batches of all
+        types share one bounded worker pool.
+
+        Args:
+            batch_size (int, optional): Number of records per upsert.
+                Defaults to UPSERT_BATCH_SIZE.
+            max_workers (int, optional): Number of upsert worker threads. Defaults to 8.
+            max_in_flight (int, optional): Global cap on in-flight database
+                requests. Defaults to 8.
+
+        Returns:
+            IngestSummary: Per-type reports and throughput
+        """
+        batch_size = batch_size or self.UPSERT_BATCH_SIZE
+        record_types = (RecordType.MOVIE, RecordType.SERIES, RecordType.ARTIST)
+        in_flight = threading.BoundedSemaphore(max_in_flight)
+        summary = IngestSummary()
+        with ThreadPoolExecutor(max_workers=max_workers) as executor, ThreadPoolExecutor(
+            max_workers=len(record_types)
+        ) as producer_executor:
+            producer_futures = {
+                record_type: producer_executor.submit(
+                    self._ingest_tmdb_daily_export_concurrent,
+                    record_type,
+                    executor,
+                    in_flight,
+                    batch_size,
+                )
+                for record_type in record_types
+            }
+            for record_type, producer_future in producer_futures.items():
+                report, wall_time_sec = producer_future.result()
+                summary.reports[record_type] = report
+                summary.wall_time_sec[record_type] = wall_time_sec
+                logger.log(
+                    level=logging.INFO,
+                    msg=f"TMDB {record_type.name} data upserted: {report.num_succeeded} "
+                    f"succeeded, {report.num_failed} failed, "
+                    f"{summary.records_per_sec(record_type):.1f} records/sec.",
+                )
+        return summary
+
+    def apply_tmdb_daily_delta(
+        self, record_type: RecordType, popularity_threshold: float = 1.0
+    ) -> bool:
+        """
+        Applies only the difference between today's and the previous TMDB export:
+        upserts the added titles and the popularities that changed more than the
+        threshold in batches, and deletes the removed titles
+
+        Args:
+            record_type (RecordType): One of MOVIE, SERIES or ARTIST
+            popularity_threshold (float, optional): Minimum absolute popularity
+                change to update. Defaults to 1.0.
+
+        Returns:
+            bool: True if every change has been applied and the snapshot saved
+        """
+        delta = self.tmdb_exporter.get_tmdb_daily_delta(record_type, popularity_threshold)
+        logger.log(
+            level=logging.INFO,
+            msg=f"Applying TMDB {record_type.name} delta: {len(delta.added)} added, "
+            f"{len(delta.removed_ids)} removed, {len(delta.popularity_changes)} updated.",
+        )
+        # Added titles and popularity changes both carry the title, so that an
+        # upsert never leaves a row without one
+        report = self.bulk_upsert_tmdb_data(
+            SupaMainData(
+                tmdb_id=row.tmdb_id, type=row.type, title=row.title, popularity=row.popularity
+            )
+            for row in itertools.chain(delta.added, delta.popularity_changes)
+        )
+        num_failed = report.num_failed
+        for tmdb_id in delta.removed_ids:
+            # A row that is already gone is not a failure, only a failed request is
+            try:
+                self._delete_tmdb_data(SupaMainData(tmdb_id=int(tmdb_id), type=record_type))
+            except SUPA_REQUEST_ERRORS as e:
+                num_failed += 1
+                logger.log(
+                    level=logging.ERROR,
+                    msg=f"Failed to delete the {record_type.name} data {tmdb_id}: {e}",
+                )
+
+        # The snapshot is only moved forward once every change is stored,
+        # so that the next delta retries the lost ones
+        if num_failed:
+            logger.log(
+                level=logging.ERROR,
+                msg=f"TMDB {record_type.name} delta not applied, {num_failed} changes failed! "
+                "The snapshot is kept.",
+            )
+            return False
+        self.tmdb_exporter.save_export_snapshot(delta)
+        logger.log(level=logging.INFO, msg=f"TMDB {record_type.name} delta applied!")
+        return True
 
     def update_tmdb_record(self, data_dict: Dict[str, Any]) -> bool:
-        pass
+        return self._update_existing_tmdb_data(self._supa_main_to_data_record(data_dict))
+
+    def get_most_popular(self, record_type: RecordType, limit: int = 1000) -> List[SupaMainData]:
+        """
+        Reads the most popular records of a type from the main table
+
+        Args:
+            record_type (RecordType): One of MOVIE, SERIES or ARTIST
+            limit (int, optional): Number of records. Defaults to 1000.
+
+        Returns:
+            List[SupaMainData]: Records in descending popularity
+        """
+        response = self._execute(
+            self.client.table(self.TABLE_NAME)
+            .select(",".join(self.COLUMN_NAMES))
+            .eq("type", record_type.name)
+            .order("popularity", desc=True)
+            .limit(limit)
+        )
+        return [self._supa_main_to_data_record(item) for item in response.data]
 
 
 if __name__ == "__main__":
@@ -1,14 +1,24 @@
 import ipdb
+import asyncio
 import datetime
 import os
+import time
+import threading
 import dataclasses
-import requests
+import aiohttp
 
-from typing import Dict, Any, List, Union
+from typing import Dict, Any, List, Union, Iterable, Tuple, AsyncIterator
 
 from db_connector.connector import ConnectorBase
 from mf_representations.records import RecordType
-from mf_representations.enums import PlatformType, RapidPlatformInfoCountry
+from mf_representations.enums import (
+    UpstreamType,
+    PlatformType,
+    RapidPlatformInfoCountry,
+    RapidPlatformInfoResult,
+)
+from mf_utils.rate_limiter import AsyncQuotaLimiter, QuotaExhaustedError
+from mf_utils.availability_cache import AvailabilityCache
 
 
 class RapidConnector(ConnectorBase):
@@ -22,7 +32,18 @@ class RapidConnector(ConnectorBase):
 
     @property
     def URL_BASE(cls) -> str:
-        return "https://streaming-availability.p.rapidapi.com"
+        # Overridable to point the connector at a local stub of the API
+        return os.environ.get("RAPID_BASE_URL", "https://streaming-availability.p.rapidapi.com")
+
+    @property
+    def UPSTREAM(cls) -> UpstreamType:
+        return UpstreamType.RAPID
+
+    @property
+    def HTTP_RETRY_STATUSES(cls) -> Tuple[int]:
+        # Every call counts against the quota, so failed calls are not retried
+        # behind the back of _request, where they could not be counted
+        return ()
 
     @property
     def URL_GET_BASIC(cls) -> str:
@@ -36,46 +57,207 @@ class RapidConnector(ConnectorBase):
     def URL_GET_TMDB_GENRE(cls) -> str:
         return f"{cls.URL_BASE}/genres"
 
+    @property
+    def COUNTRIES_CACHE_TTL(cls) -> int:
+        return 24 * 60 * 60
+
+    @property
+    def QUOTA_REMAINING_HEADER(cls) -> str:
+        return "X-RateLimit-Requests-Remaining"
+
     @property
     def HEADERS(cls) -> Dict[str, Any]:
         return {"X-RapidAPI-Key": cls.AUTH_TOKEN, "X-RapidAPI-Host": cls.HOST_BASE}
 
+    def __init__(self) -> None:
+        super().__init__()
+        self._countries_lock = threading.Lock()
+        self._countries_fetched_at = None
+        self._platform_countries: Dict[PlatformType, List[str]] = {}
+        self._country_platform_masks: Dict[str, int] = {}
+        self.availability_cache = AvailabilityCache()
+
+    def _refresh_countries(self) -> None:
+        # Fetches the country lists once per TTL and precomputes a
+        # country -> platform bitmask table for local lookups
+        with self._countries_lock:
+            if (
+                self._countries_fetched_at is not None
+                and time.monotonic() - self._countries_fetched_at < self.COUNTRIES_CACHE_TTL
+            ):
+                return
+            response = self._request("GET", self.URL_GET_COUNTRIES, headers=self.HEADERS)
+            response.raise_for_status()
+            countries = response.json()
+            platform_countries = {}
+            country_platform_masks = {}
+            for platform in PlatformType:
+                platform_countries[platform] = countries.get(platform.name.lower()) or []
+                for country in platform_countries[platform]:
+                    country_platform_masks[country] = (
+                        country_platform_masks.get(country, 0) | platform.bit
+                    )
+            self._platform_countries = platform_countries
+            self._country_platform_masks = country_platform_masks
+            self._countries_fetched_at = time.monotonic()
+
+    def _get_country_platform_mask(self, country: str) -> int:
+        self._refresh_countries()
+        return self._country_platform_masks.get(country, 0)
+
     def get_country_streaming_info(self, platform_type: PlatformType) -> List[str]:
-        response = requests.request("GET", self.URL_GET_COUNTRIES, headers=self.HEADERS)
-        response.raise_for_status()
-        return response.json().get(platform_type.name.lower())
+        self._refresh_countries()
+        return self._platform_countries.get(platform_type)
 
     def check_platform_available_in_country(
         self, platform_type: PlatformType, country: str
-    ) -> List[str]:
-        response = requests.request("GET", self.URL_GET_COUNTRIES, headers=self.HEADERS)
-        response.raise_for_status()
-        return country in response.json().get(platform_type.name.lower())
+    ) -> bool:
+        return bool(self._get_country_platform_mask(country) & platform_type.bit)
 
     def get_country_platform_info(self, country: str) -> List[PlatformType]:
-        response = requests.request("GET", self.URL_GET_COUNTRIES, headers=self.HEADERS)
-        response.raise_for_status()
-        country_platform_list = []
-        for platform in PlatformType:
-            if country in response.json().get(platform.name.lower()):
-                country_platform_list.append(platform)
-        return country_platform_list
+        country_platform_mask = self._get_country_platform_mask(country)
+        return [platform for platform in PlatformType if country_platform_mask & platform.bit]
+
+    def get_countries_with_platforms(
+        self, platform_types: List[PlatformType], match_all: bool = True
+    ) -> List[str]:
+        """
+        Returns the countries in which the given platforms are available
+
+        Args:
+            platform_types (List[PlatformType]): Platforms to look for
+            match_all (bool, optional): If True, all platforms have to be available
+                in a country, otherwise any of them. Defaults to True.
+
+        Returns:
+            List[str]: Country codes
+        """
+        self._refresh_countries()
+        platform_mask = 0
+        for platform_type in platform_types:
+            platform_mask |= platform_type.bit
+        return [
+            country
+            for country, country_platform_mask in self._country_platform_masks.items()
+            if (
+                country_platform_mask & platform_mask == platform_mask
+                if match_all
+                else country_platform_mask & platform_mask
+            )
+        ]
 
     def get_tmdb_genre_id_list(self) -> Dict[int, str]:
-        response = requests.request("GET", self.URL_GET_TMDB_GENRE, headers=self.HEADERS)
+        response = self._request("GET", self.URL_GET_TMDB_GENRE, headers=self.HEADERS)
         response.raise_for_status()
         return response.json()
 
-    def get_platform_info(
-        self, tmdb_id: int, type: RecordType, country: str = "us", output_language: str = "en"
-    ) -> Dict[str, Any]:
-        query = {
-            "tmdb_id": f"{type.name.lower()}/{tmdb_id}",
+    def _get_platform_info_query(
+        self, tmdb_id: int, type: RecordType, country: str, output_language: str
+    ) -> Dict[str, str]:
+        return {
+            "tmdb_id": f"{type.value}/{tmdb_id}",
             "output_language": output_language,
             "country": country,
         }
-        response = requests.get(self.URL_GET_BASIC, headers=self.HEADERS, params=query)
+
+    def get_platform_info(
+        self,
+        tmdb_id: int,
+        type: RecordType,
+        country: str = "us",
+        output_language: str = "en",
+        use_cache: bool = True,
+    ) -> RapidPlatformInfoCountry:
+        if use_cache:
+            movie_platform_info = self.availability_cache.get(tmdb_id, type, country)
+            if movie_platform_info is not None:
+                return movie_platform_info
+        query = self._get_platform_info_query(tmdb_id, type, country, output_language)
+        response = self._request("GET", self.URL_GET_BASIC, headers=self.HEADERS, params=query)
         response.raise_for_status()
         movie_platform_info = RapidPlatformInfoCountry()
-        movie_platform_info.generate_data_from_rapid(response.json())
+        movie_platform_info.generate_data_from_rapid(response.json(), tmdb_id, type)
+        self.availability_cache.put(tmdb_id, type, country, movie_platform_info)
         return movie_platform_info
+
+    async def _get_platform_info_async(
+        self,
+        session: aiohttp.ClientSession,
+        limiter: AsyncQuotaLimiter,
+        tmdb_id: int,
+        type: RecordType,
+        country: str,
+        output_language: str,
+    ) -> RapidPlatformInfoResult:
+        result = RapidPlatformInfoResult(tmdb_id=tmdb_id, record_type=type, country=country)
+        result.platform_info = self.availability_cache.get(tmdb_id, type, country)
+        if result.platform_info is not None:
+            return result
+        try:
+            await limiter.acquire()
+            query = self._get_platform_info_query(tmdb_id, type, country, output_language)
+            async with session.get(self.URL_GET_BASIC, params=query) as response:
+                self.rate_limiter.update_from_headers(response.status, response.headers)
+                remaining = response.headers.get(self.QUOTA_REMAINING_HEADER)
+                if remaining is not None:
+                    limiter.update_remaining(int(remaining))
+                response.raise_for_status()
+                data = await response.json()
+            # Only a fully parsed result is set, so that either platform_info or error is set
+            platform_info = RapidPlatformInfoCountry()
+            platform_info.generate_data_from_rapid(data, tmdb_id, type)
+            self.availability_cache.put(tmdb_id, type, country, platform_info)
+            result.platform_info = platform_info
+        except (
+            aiohttp.ClientError,
+            asyncio.TimeoutError,
+            QuotaExhaustedError,
+            KeyError,
+            ValueError,
+            TypeError,
+        ) as e:
+            result.error = f"{e.__class__.__name__}: {e}"
+        return result
+
+    async def get_platform_info_many(
+        self,
+        items: Iterable[Tuple[int, RecordType, str]],
+        max_concurrency: int = 10,
+        quota: int = None,
+        output_language: str = "en",
+    ) -> AsyncIterator[RapidPlatformInfoResult]:
+        """
+        Fetches the platform info of many (tmdb_id, record type, country) items
+        concurrently and yields the results as they finish. Failures are
+        reported per item instead of aborting the batch.
+
+        Args:
+            items (Iterable[Tuple[int, RecordType, str]]): Items to fetch
+            max_concurrency (int, optional): Maximum number of requests in flight.
+                Defaults to 10.
+            quota (int, optional): Maximum number of requests to spend. Lowered further
+                by the remaining quota reported by RapidAPI. Defaults to no limit.
+            output_language (str, optional): Output language. Defaults to "en".
+
+        Yields:
+            RapidPlatformInfoResult: Result or error of each item in completion order
+        """
+        limiter = AsyncQuotaLimiter(self.rate_limiter, quota)
+        async with aiohttp.ClientSession(headers=self.HEADERS) as session:
+            pending = set()
+            for tmdb_id, record_type, country in items:
+                if len(pending) >= max_concurrency:
+                    done, pending = await asyncio.wait(
+                        pending, return_when=asyncio.FIRST_COMPLETED
+                    )
+                    for task in done:
+                        yield task.result()
+                pending.add(
+                    asyncio.create_task(
+                        self._get_platform_info_async(
+                            session, limiter, tmdb_id, record_type, country, output_language
+                        )
+                    )
+                )
+            for task in asyncio.as_completed(pending):
+                yield await task
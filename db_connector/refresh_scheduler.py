@@ -0,0 +1,252 @@
+import heapq
+import itertools
+import logging
+import math
+import threading
+import time
+
+from requests.exceptions import RequestException
+from typing import Callable, Dict, Iterable, List, Tuple
+
+from db_connector.availability_store import AvailabilityStore
+from db_connector.rapid_connector import RapidConnector
+from mf_representations.enums import AvailabilityRefreshItem, RecordType
+from mf_utils import logger_setup
+from mf_utils.rate_limiter import QuotaExhaustedError
+
+logger = logger_setup.get_logger()
+
+
+class AvailabilityRefreshScheduler:
+    """
+    Refreshes the availability store from RapidAPI within a daily request budget.
+    Work items are kept in a priority queue, ordered by the popularity of the
+    title, the time since its last refresh and how soon it leaves a platform.
+    Requests are spread evenly over the day, one every 86400 / daily_budget
+    seconds, and a slot is left unused when no item is due. Every upstream
+    call counts against the budget, retries included, and failed items
+    back off exponentially.
+    Clock and sleep are injectable, so that the scheduler can be run against a
+    local RapidAPI stub (see RAPID_BASE_URL) without waiting in real time.
+    """
+
+    # Titles refreshed more recently are not due, unless they are leaving soon
+    MIN_REFRESH_INTERVAL = 12 * 60 * 60
+    LEAVING_REFRESH_INTERVAL = 2 * 60 * 60
+    # Age at which the staleness of a title saturates
+    MAX_STALENESS = 7 * 24 * 60 * 60
+    # Leaving times closer than this raise the priority of a title
+    LEAVING_HORIZON = 3 * 24 * 60 * 60
+    # Queued priorities only change on pop, so all of them are recomputed periodically
+    REPRIORITIZE_INTERVAL = 60 * 60
+    # A failed item is not due again for FAILURE_BACKOFF * 2 ** (failures - 1) seconds
+    FAILURE_BACKOFF = 15 * 60
+    MAX_FAILURE_BACKOFF = 24 * 60 * 60
+
+    def __init__(
+        self,
+        rapid_connector: RapidConnector,
+        availability_store: AvailabilityStore,
+        daily_budget: int,
+        clock: Callable[[], float] = time.time,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> None:
+        if daily_budget <= 0:
+            raise ValueError("Daily budget must be positive")
+        self.rapid_connector = rapid_connector
+        self.availability_store = availability_store
+        self.daily_budget = daily_budget
+        self.clock = clock
+        self.sleep = sleep
+        # Heap of (-priority, sequence, item), the sequence keeps ties in insertion order
+        self._heap: List[Tuple[float, int, AvailabilityRefreshItem]] = []
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+        self._next_request_at = None
+        self._reprioritized_at = clock()
+        # (tmdb_id, record type, country) -> (number of failures in a row, last attempt time)
+        self._failures: Dict[Tuple[int, RecordType, str], Tuple[int, float]] = {}
+        # Upstream calls, counting every attempt of a slot against the budget
+        self.num_requests = 0
+        self.num_failed = 0
+
+    @property
+    def request_interval(self) -> float:
+        return 24 * 60 * 60 / self.daily_budget
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def get_priority(self, item: AvailabilityRefreshItem, now: float) -> float:
+        """
+        Priority of a work item, 0 if it is not due for a refresh. An item
+        that failed is not due until its exponential backoff has passed.
+
+        Args:
+            item (AvailabilityRefreshItem): Work item
+            now (float): Current epoch time
+
+        Returns:
+            float: Priority, higher is refreshed first
+        """
+        failures = self._failures.get(item[:3])
+        if failures is not None:
+            num_failures, attempted_at = failures
+            backoff = min(
+                self.FAILURE_BACKOFF * 2 ** (num_failures - 1), self.MAX_FAILURE_BACKOFF
+            )
+            if now - attempted_at < backoff:
+                return 0.0
+        refreshed_at, leaving = self.availability_store.get_refresh_state(
+            item.tmdb_id, item.record_type, item.country, now
+        )
+        age = now - refreshed_at if refreshed_at is not None else self.MAX_STALENESS
+        leaving_urgency = 0.0
+        if leaving is not None and leaving - now < self.LEAVING_HORIZON:
+            leaving_urgency = 1.0 - (leaving - now) / self.LEAVING_HORIZON
+        min_interval = (
+            self.LEAVING_REFRESH_INTERVAL if leaving_urgency > 0 else self.MIN_REFRESH_INTERVAL
+        )
+        if age < min_interval:
+            return 0.0
+        staleness = min(age / self.MAX_STALENESS, 1.0)
+        return (1.0 + math.log1p(max(item.popularity or 0.0, 0.0))) * (
+            staleness + leaving_urgency
+        )
+
+    def _push(self, item: AvailabilityRefreshItem, priority: float) -> None:
+        heapq.heappush(self._heap, (-priority, next(self._sequence), item))
+
+    def add(self, item: AvailabilityRefreshItem) -> None:
+        with self._lock:
+            self._push(item, self.get_priority(item, self.clock()))
+
+    def add_many(self, items: Iterable[AvailabilityRefreshItem]) -> None:
+        now = self.clock()
+        with self._lock:
+            for item in items:
+                self._heap.append((-self.get_priority(item, now), next(self._sequence), item))
+            heapq.heapify(self._heap)
+
+    def add_popular_titles(
+        self,
+        supa_connector,
+        countries: List[str],
+        limit: int = 1000,
+        record_types: Tuple[RecordType] = (RecordType.MOVIE, RecordType.SERIES),
+    ) -> int:
+        """
+        Queues the most popular titles of the main table in every given country
+
+        Args:
+            supa_connector (SupaTmdbConnector): Connector of the main table
+            countries (List[str]): Country codes
+            limit (int, optional): Number of titles per record type. Defaults to 1000.
+            record_types (Tuple[RecordType], optional): Record types to queue.
+                Defaults to movies and series.
+
+        Returns:
+            int: Number of queued items
+        """
+        items = [
+            AvailabilityRefreshItem(record.tmdb_id, record.type, country, record.popularity or 0.0)
+            for record_type in record_types
+            for record in supa_connector.get_most_popular(record_type, limit)
+            for country in countries
+        ]
+        self.add_many(items)
+        return len(items)
+
+    def _reprioritize(self, now: float) -> None:
+        self._heap = [
+            (-self.get_priority(item, now), sequence, item) for _, sequence, item in self._heap
+        ]
+        heapq.heapify(self._heap)
+        self._reprioritized_at = now
+
+    def _pop_due(self, now: float) -> AvailabilityRefreshItem:
+        # Stored priorities go stale, e.g. when another country of the same title was
+        # refreshed, so the top item is re-scored and only taken if it still beats
+        # the next stored priority. Each item is re-scored at most once per call.
+        for _ in range(len(self._heap)):
+            _, _, item = heapq.heappop(self._heap)
+            priority = self.get_priority(item, now)
+            if not self._heap or priority >= -self._heap[0][0]:
+                if priority > 0:
+                    return item
+                self._push(item, priority)
+                return None
+            self._push(item, priority)
+        return None
+
+    def refresh_next(self) -> AvailabilityRefreshItem:
+        """
+        Refreshes the availability of the highest priority due item, if any.
+        The item is queued again afterwards, also when the request failed.
+
+        Returns:
+            AvailabilityRefreshItem: Refreshed item, None if no item was due
+        """
+        with self._lock:
+            now = self.clock()
+            if now - self._reprioritized_at >= self.REPRIORITIZE_INTERVAL:
+                self._reprioritize(now)
+            item = self._pop_due(now)
+        if item is None:
+            return None
+
+        num_http_requests = self.rapid_connector.num_http_requests
+        try:
+            platform_info = self.rapid_connector.get_platform_info(
+                item.tmdb_id, item.record_type, country=item.country, use_cache=False
+            )
+            self.availability_store.put_platform_info(
+                item.tmdb_id, item.record_type, item.country, platform_info, self.clock()
+            )
+            self._failures.pop(item[:3], None)
+        except (RequestException, QuotaExhaustedError, KeyError, ValueError, TypeError) as e:
+            self.num_failed += 1
+            num_failures = self._failures.get(item[:3], (0, None))[0] + 1
+            self._failures[item[:3]] = (num_failures, self.clock())
+            logger.log(
+                level=logging.WARNING,
+                msg=f"Failed to refresh {item.record_type.name} {item.tmdb_id} "
+                f"in {item.country}: {e}",
+            )
+        finally:
+            # Retries of 429 responses are separate upstream calls
+            self.num_requests += self.rapid_connector.num_http_requests - num_http_requests
+        with self._lock:
+            self._push(item, self.get_priority(item, self.clock()))
+        return item
+
+    def run(self, max_slots: int = None, stop_event: threading.Event = None) -> None:
+        """
+        Refreshes items one slot at a time until stopped
+
+        Args:
+            max_slots (int, optional): Number of request slots to run, used or not.
+                Defaults to None, which runs until stop_event is set.
+            stop_event (threading.Event, optional): Stops the loop once set. Defaults to None.
+        """
+        for _ in itertools.count() if max_slots is None else range(max_slots):
+            if stop_event is not None and stop_event.is_set():
+                break
+            now = self.clock()
+            if self._next_request_at is None:
+                self._next_request_at = now
+            elif self._next_request_at > now:
+                self.sleep(self._next_request_at - now)
+            num_requests = self.num_requests
+            self.refresh_next()
+            # A slot that made several calls uses up as many slots, and a late slot
+            # is not made up for, so the requests never come in bursts
+            num_slots = max(self.num_requests - num_requests, 1)
+            self._next_request_at = max(
+                self._next_request_at + num_slots * self.request_interval, self.clock()
+            )
+        logger.log(
+            level=logging.INFO,
+            msg=f"Availability refresh stopped after {self.num_requests} requests, "
+            f"{self.num_failed} failed.",
+        )
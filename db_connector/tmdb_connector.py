@@ -1,103 +1,440 @@
 import json
-import gzip
+import math
+import zlib
+import itertools
+import logging
 import ipdb
-import time
-import requests
 import os
-import jsonlines
-import tempfile
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
+from requests.exceptions import RequestException
 from pathlib import Path
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
 from datetime import date
-from typing import List, Dict, Any, Union
+from typing import List, Dict, Any, Union, Iterable, Iterator, Tuple
 
 from db_connector.connector import ConnectorBase
 from mf_representations.records import MovieRecord, SeriesRecord, ArtistRecord
-from mf_representations.enums import RecordType
+from mf_representations.enums import (
+    RecordType,
+    TmdbExportRow,
+    TmdbExportColumns,
+    TmdbExportDelta,
+    ExportFormat,
+    UpstreamType,
+)
 from mf_representations.configs import TmdbImageConfig
+from mf_utils import logger_setup
+from mf_utils.response_cache import ResponseCache
+from mf_utils.export_parser import parse_export_lines, parse_export_chunk
 
+logger = logger_setup.get_logger()
 
-class TmdbExporter:
-    def _get_tmdb_daily_export(self, type: str) -> Path:
-        files_base_url = "http://files.tmdb.org/p/exports/"
-        today_date = date.today().strftime("%d_%m_%Y")
-        export_url = f"{files_base_url}{type}_ids_{today_date}.json.gz"
-        req_json_file = requests.get(export_url)
-        req_json_file.raise_for_status()
 
+class TmdbExporter(ConnectorBase):
+    """
+    Downloads and parses the TMDB daily id exports. Exports are streamed
+    and decompressed chunk by chunk so that memory stays flat regardless
+    of the export size.
+    """
+
+    @property
+    def AUTH_TOKEN(cls) -> str:
+        return None
+
+    @property
+    def URL_BASE(cls) -> str:
+        return "http://files.tmdb.org/p/exports"
+
+    STREAM_CHUNK_SIZE = 1024 * 1024
+
+    # Record type -> (export file prefix, title key in the export rows)
+    EXPORT_TYPES = {
+        RecordType.MOVIE: ("movie", "original_title"),
+        RecordType.SERIES: ("tv_series", "original_name"),
+        RecordType.ARTIST: ("person", "name"),
+    }
+
+    PARSE_BATCH_SIZE = 10000
+
+    # Approximate size of the decompressed chunks handed to the parsing processes
+    PARSE_CHUNK_SIZE = 4 * 1024 * 1024
+
+    SNAPSHOT_DIR = Path(__file__).parent.resolve() / "export_snapshots"
+
+    ID_TITLES_SCHEMA = pa.schema(
+        [
+            ("tmdb_id", pa.int32()),
+            ("title", pa.string()),
+            ("popularity", pa.float32()),
+            ("type", pa.dictionary(pa.int8(), pa.string())),
+        ]
+    )
+
+    def __init__(self) -> None:
+        super().__init__()
+        # Record type -> number of malformed lines skipped in the last parsed export
+        self.malformed_line_counts: Dict[RecordType, int] = {}
+
+    def _get_tmdb_daily_export_url(self, type: str, export_date: date = None) -> str:
+        export_date = (export_date or date.today()).strftime("%d_%m_%Y")
+        return f"{self.URL_BASE}/{type}_ids_{export_date}.json.gz"
+
+    def _iter_tmdb_daily_export_chunks(
+        self, type: str, export_date: date = None
+    ) -> Iterator[bytes]:
+        """
+        Streams the gzipped daily export and yields the decompressed data in
+        chunks of about PARSE_CHUNK_SIZE bytes, each cut on a newline boundary
+
+        Args:
+            type (str): Export file prefix, e.g. "movie", "tv_series", "person"
+            export_date (date, optional): Date of the export. Defaults to today.
+
+        Yields:
+            bytes: Whole json lines of the export
+        """
+        export_url = self._get_tmdb_daily_export_url(type, export_date)
+        with self._request("GET", export_url, stream=True) as response:
+            response.raise_for_status()
+            decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+            buffer = b""
+            for chunk in response.raw.stream(self.STREAM_CHUNK_SIZE, decode_content=False):
+                buffer += decompressor.decompress(chunk)
+                if len(buffer) < self.PARSE_CHUNK_SIZE:
+                    continue
+                cut = buffer.rfind(b"\n") + 1
+                if cut:
+                    yield buffer[:cut]
+                    buffer = buffer[cut:]
+            buffer += decompressor.flush()
+            if buffer:
+                yield buffer
+
+    def _iter_tmdb_daily_export_lines(
+        self, type: str, export_date: date = None
+    ) -> Iterator[bytes]:
+        """
+        Streams the gzipped daily export and yields the decompressed lines
+        without holding the whole file in memory
+
+        Args:
+            type (str): Export file prefix, e.g. "movie", "tv_series", "person"
+            export_date (date, optional): Date of the export. Defaults to today.
+
+        Yields:
+            bytes: A single raw json line of the export
+        """
+        for chunk in self._iter_tmdb_daily_export_chunks(type, export_date):
+            lines = chunk.split(b"\n")
+            if not lines[-1]:
+                lines.pop()
+            yield from lines
+
+    def _get_tmdb_daily_export(self, type: str) -> Path:
         written_file_name = Path(__file__).parent.resolve() / f"{type}_title_id_list.jsonl"
-        with open(written_file_name, "w") as f:
-            f.write(req_json_file.content)
+        with open(written_file_name, "wb") as f:
+            for line in self._iter_tmdb_daily_export_lines(type):
+                f.write(line + b"\n")
         return written_file_name
 
-    def export_all_movie_id_titles(self) -> pd.DataFrame:
-        data = []
-        with open(self._get_tmdb_daily_export("movie"), "r") as f:
-            for line in f.readlines():
-                try:
-                    obj = json.loads(line)
-                    data.append(
-                        {
-                            "tmdb_id": obj["id"],
-                            "title": obj["original_title"],
-                            "popularity": obj["popularity"],
-                            "type": RecordType.MOVIE.name,
-                        }
-                    )
-                except:
-                    continue
-        return pd.DataFrame(data)
-
-    def export_all_series_id_titles(self) -> pd.DataFrame:
-        data = []
-        with open(self._get_tmdb_daily_export("tv_series"), "r") as f:
-            for line in f.readlines():
-                try:
-                    obj = json.loads(line)
-                    data.append(
-                        {
-                            "tmdb_id": obj["id"],
-                            "title": obj["original_name"],
-                            "popularity": obj["popularity"],
-                            "type": RecordType.SERIES.name,
-                        }
-                    )
-                except:
-                    continue
-        return pd.DataFrame(data)
-
-    def export_all_artist_id_titles(self) -> pd.DataFrame:
-        data = []
-        with open(self._get_tmdb_daily_export("person"), "r") as f:
-            for line in f.readlines():
-                try:
-                    obj = json.loads(line)
-                    data.append(
-                        {
-                            "tmdb_id": obj["id"],
-                            "title": obj["name"],
-                            "popularity": obj["popularity"],
-                            "type": RecordType.ARTIST.name,
-                        }
-                    )
-                except:
-                    continue
-        return pd.DataFrame(data)
-
-    def export_all_id_titles(self) -> None:
-        df = pd.concat(
-            [
-                self.export_all_movie_id_titles(),
-                self.export_all_series_id_titles(),
-                self.export_all_artist_id_titles(),
-            ]
+    def _iter_parsed_export_columns(
+        self, export_type: str, title_key: str, export_date: date = None
+    ) -> Iterator[TmdbExportColumns]:
+        lines = self._iter_tmdb_daily_export_lines(export_type, export_date)
+        while True:
+            batch = list(itertools.islice(lines, self.PARSE_BATCH_SIZE))
+            if not batch:
+                break
+            yield parse_export_lines(batch, title_key)
+
+    def _iter_parsed_export_columns_parallel(
+        self,
+        export_type: str,
+        title_key: str,
+        export_date: date = None,
+        max_workers: int = None,
+        max_in_flight: int = None,
+    ) -> Iterator[TmdbExportColumns]:
+        # The export is decompressed once in this process, and its chunks are parsed
+        # on the pool. At most max_in_flight chunks are submitted ahead of the one
+        # being yielded, so results come out in export order with bounded memory.
+        max_in_flight = max_in_flight or 2 * max_workers
+        chunks = self._iter_tmdb_daily_export_chunks(export_type, export_date)
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = deque()
+            for chunk in chunks:
+                futures.append(executor.submit(parse_export_chunk, chunk, title_key))
+                if len(futures) >= max_in_flight:
+                    yield futures.popleft().result()
+            while futures:
+                yield futures.popleft().result()
+
+    def iter_tmdb_daily_export_columns(
+        self,
+        record_type: RecordType,
+        export_date: date = None,
+        max_workers: int = None,
+        max_in_flight: int = None,
+    ) -> Iterator[TmdbExportColumns]:
+        """
+        Generator over the parsed daily TMDB export of the given type in batches.
+        With max_workers > 1 the export chunks are parsed on a process pool, and
+        the batches are still yielded in export order. The number of malformed
+        lines is logged at the end and kept in malformed_line_counts.
+
+        Args:
+            record_type (RecordType): One of MOVIE, SERIES or ARTIST
+            export_date (date, optional): Date of the export. Defaults to today.
+            max_workers (int, optional): Number of parsing processes. Defaults to None,
+                which parses in the calling process.
+            max_in_flight (int, optional): Maximum number of chunks submitted to the
+                pool at a time. Defaults to twice max_workers.
+
+        Yields:
+            TmdbExportColumns: Typed columns of a batch of export lines
+        """
+        if record_type not in self.EXPORT_TYPES:
+            raise ValueError(f"Unsupported record type: {record_type}")
+        export_type, title_key = self.EXPORT_TYPES[record_type]
+        if max_workers is not None and max_workers > 1:
+            batches = self._iter_parsed_export_columns_parallel(
+                export_type, title_key, export_date, max_workers, max_in_flight
+            )
+        else:
+            batches = self._iter_parsed_export_columns(export_type, title_key, export_date)
+
+        num_malformed = 0
+        for columns in batches:
+            num_malformed += columns.num_malformed
+            yield columns
+        self.malformed_line_counts[record_type] = num_malformed
+        if num_malformed:
+            logger.log(
+                level=logging.WARNING,
+                msg=f"Skipped {num_malformed} malformed lines of the {export_type} export",
+            )
+
+    def iter_tmdb_daily_export(
+        self, record_type: RecordType, export_date: date = None
+    ) -> Iterator[TmdbExportRow]:
+        """
+        Generator over the parsed rows of a daily TMDB export of the given type
+
+        Args:
+            record_type (RecordType): One of MOVIE, SERIES or ARTIST
+            export_date (date, optional): Date of the export. Defaults to today.
+
+        Yields:
+            TmdbExportRow: (tmdb_id, title, popularity, type) rows
+        """
+        for columns in self.iter_tmdb_daily_export_columns(record_type, export_date):
+            for tmdb_id, title, popularity in zip(
+                columns.tmdb_ids.tolist(), columns.titles, columns.popularity.tolist()
+            ):
+                yield TmdbExportRow(tmdb_id, title, popularity, record_type)
+
+    def iter_all_movie_id_titles(self) -> Iterator[TmdbExportRow]:
+        return self.iter_tmdb_daily_export(RecordType.MOVIE)
+
+    def iter_all_series_id_titles(self) -> Iterator[TmdbExportRow]:
+        return self.iter_tmdb_daily_export(RecordType.SERIES)
+
+    def iter_all_artist_id_titles(self) -> Iterator[TmdbExportRow]:
+        return self.iter_tmdb_daily_export(RecordType.ARTIST)
+
+    def _get_export_snapshot_file_name(self, record_type: RecordType) -> Path:
+        return self.SNAPSHOT_DIR / f"{self.EXPORT_TYPES[record_type][0]}_snapshot.npz"
+
+    def _load_export_snapshot(self, record_type: RecordType) -> Tuple[np.ndarray, np.ndarray]:
+        snapshot_file_name = self._get_export_snapshot_file_name(record_type)
+        if not snapshot_file_name.exists():
+            return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float32)
+        with np.load(snapshot_file_name) as snapshot:
+            return snapshot["ids"], snapshot["popularity"]
+
+    def save_export_snapshot(self, delta: TmdbExportDelta) -> Path:
+        """
+        Stores today's export as the snapshot that the next delta is computed against.
+        Should be called only after the delta has been applied.
+
+        Args:
+            delta (TmdbExportDelta): Delta returned by get_tmdb_daily_delta
+
+        Returns:
+            Path: Path of the written snapshot
+        """
+        self.SNAPSHOT_DIR.mkdir(parents=True, exist_ok=True)
+        snapshot_file_name = self._get_export_snapshot_file_name(delta.record_type)
+        tmp_file_name = snapshot_file_name.with_suffix(".tmp.npz")
+        np.savez(
+            tmp_file_name,
+            ids=delta.snapshot_ids,
+            popularity=delta.snapshot_popularity.astype(np.float32),
+        )
+        os.replace(tmp_file_name, snapshot_file_name)
+        return snapshot_file_name
+
+    @staticmethod
+    def _find_sorted(needles: np.ndarray, haystack: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        # Returns the membership mask of the sorted needles in the sorted haystack
+        # together with their (clipped) positions in the haystack
+        if len(haystack) == 0:
+            return np.zeros(len(needles), dtype=bool), np.zeros(len(needles), dtype=np.intp)
+        positions = np.minimum(np.searchsorted(haystack, needles), len(haystack) - 1)
+        return haystack[positions] == needles, positions
+
+    def get_tmdb_daily_delta(
+        self, record_type: RecordType, popularity_threshold: float = 1.0, max_workers: int = None
+    ) -> TmdbExportDelta:
+        """
+        Compares today's export with the previously saved snapshot
+
+        Args:
+            record_type (RecordType): One of MOVIE, SERIES or ARTIST
+            popularity_threshold (float, optional): Minimum absolute popularity
+                change to report. Defaults to 1.0.
+            max_workers (int, optional): Number of export parsing processes.
+                Defaults to None, which parses in the calling process.
+
+        Returns:
+            TmdbExportDelta: Added rows, removed ids and popularity changes
+        """
+        columns = TmdbExportColumns.concat(
+            list(self.iter_tmdb_daily_export_columns(record_type, max_workers=max_workers))
+        )
+        ids, popularity, titles = columns.tmdb_ids, columns.popularity, columns.titles
+
+        order = np.argsort(ids, kind="stable")
+        ids, popularity = ids[order], popularity[order]
+        unique_mask = np.ones(len(ids), dtype=bool)
+        unique_mask[1:] = ids[1:] != ids[:-1]
+        order, ids, popularity = order[unique_mask], ids[unique_mask], popularity[unique_mask]
+
+        prev_ids, prev_popularity = self._load_export_snapshot(record_type)
+        found, positions = self._find_sorted(ids, prev_ids)
+        prev_found, _ = self._find_sorted(prev_ids, ids)
+        changed = np.zeros(len(ids), dtype=bool)
+        changed[found] = (
+            np.abs(popularity[found] - prev_popularity[positions[found]]) > popularity_threshold
+        )
+
+        return TmdbExportDelta(
+            record_type=record_type,
+            added=[
+                TmdbExportRow(int(ids[i]), titles[order[i]], float(popularity[i]), record_type)
+                for i in np.flatnonzero(~found)
+            ],
+            removed_ids=prev_ids[~prev_found],
+            popularity_changes=[
+                TmdbExportRow(int(ids[i]), titles[order[i]], float(popularity[i]), record_type)
+                for i in np.flatnonzero(changed)
+            ],
+            snapshot_ids=ids,
+            snapshot_popularity=popularity,
         )
-        df.drop(index=df[df.title.apply(len) == 0].index, inplace=True)
-        df.reset_index(inplace=True)
-        df.drop(columns=["index"], inplace=True)
+
+    def _export_id_titles(self, record_type: RecordType, max_workers: int = None) -> pd.DataFrame:
+        columns = TmdbExportColumns.concat(
+            list(self.iter_tmdb_daily_export_columns(record_type, max_workers=max_workers))
+        )
+        columns = columns.drop_empty_titles()
+        return pd.DataFrame(
+            {
+                "tmdb_id": columns.tmdb_ids,
+                "title": columns.titles,
+                "popularity": columns.popularity,
+                "type": record_type.name,
+            },
+            columns=TmdbExportRow._fields,
+        )
+
+    def export_all_movie_id_titles(self, max_workers: int = None) -> pd.DataFrame:
+        return self._export_id_titles(RecordType.MOVIE, max_workers)
+
+    def export_all_series_id_titles(self, max_workers: int = None) -> pd.DataFrame:
+        return self._export_id_titles(RecordType.SERIES, max_workers)
+
+    def export_all_artist_id_titles(self, max_workers: int = None) -> pd.DataFrame:
+        return self._export_id_titles(RecordType.ARTIST, max_workers)
+
+    def _write_id_titles_csv(self, df_list: List[pd.DataFrame]) -> Path:
+        df = pd.concat(df_list)
+        df = df[df.title.astype(str).str.len() > 0].reset_index(drop=True)
         all_export_file_name = Path(__file__).parent.resolve() / "all_id_titles.csv"
         df.to_csv(all_export_file_name, sep="|", index_label="id", float_format="%g")
+        return all_export_file_name
+
+    def _write_id_titles_parquet(self, df_list: List[pd.DataFrame]) -> Path:
+        # Each record type is written separately, so that every row group
+        # only holds a single type and can be skipped by type filters
+        all_export_file_name = Path(__file__).parent.resolve() / "all_id_titles.parquet"
+        with pq.ParquetWriter(all_export_file_name, self.ID_TITLES_SCHEMA) as writer:
+            for df in df_list:
+                # An empty frame has no string dtype for .str, and nothing to write
+                if df.empty:
+                    continue
+                df = df[df.title.astype(str).str.len() > 0].astype(
+                    {"tmdb_id": "int32", "popularity": "float32", "type": "category"}
+                )
+                table = pa.Table.from_pandas(
+                    df, schema=self.ID_TITLES_SCHEMA, preserve_index=False
+                )
+                writer.write_table(table)
+        return all_export_file_name
+
+    def export_all_id_titles(
+        self, output_format: ExportFormat = ExportFormat.CSV, max_workers: int = None
+    ) -> Path:
+        """
+        Exports the ids, titles and popularities of all movies, series and artists
+
+        Args:
+            output_format (ExportFormat, optional): Pipe separated CSV or columnar
+                Parquet file. Defaults to ExportFormat.CSV.
+            max_workers (int, optional): Number of export parsing processes.
+                Defaults to None, which parses in the calling process.
+
+        Returns:
+            Path: Path of the written export file
+        """
+        df_list = [
+            self.export_all_movie_id_titles(max_workers),
+            self.export_all_series_id_titles(max_workers),
+            self.export_all_artist_id_titles(max_workers),
+        ]
+        if output_format == ExportFormat.PARQUET:
+            return self._write_id_titles_parquet(df_list)
+        return self._write_id_titles_csv(df_list)
+
+    @staticmethod
+    def read_all_id_titles(
+        file_name: Path,
+        columns: List[str] = None,
+        record_types: List[RecordType] = None,
+    ) -> pd.DataFrame:
+        """
+        Reads a Parquet export written by export_all_id_titles, loading only
+        the requested columns and row groups of the requested record types
+
+        Args:
+            file_name (Path): Path of the Parquet export
+            columns (List[str], optional): Columns to load. Defaults to all columns.
+            record_types (List[RecordType], optional): Record types to load.
+                Defaults to all types.
+
+        Returns:
+            pd.DataFrame: Loaded export
+        """
+        filters = None
+        if record_types is not None:
+            filters = [("type", "in", [record_type.name for record_type in record_types])]
+        return pq.read_table(file_name, columns=columns, filters=filters).to_pandas()
 
 
 class TmdbConnector(ConnectorBase):
@@ -113,23 +450,102 @@ class TmdbConnector(ConnectorBase):
     def URL_BASE(cls) -> str:
         return "https://api.themoviedb.org/3"
 
-    def __init__(self) -> None:
+    @property
+    def UPSTREAM(cls) -> UpstreamType:
+        return UpstreamType.TMDB
+
+    @property
+    def POPULAR_MAX_PAGES(cls) -> int:
+        # TMDB does not serve list pages after page 500
+        return 500
+
+    @property
+    def MAX_WORKERS(cls) -> int:
+        return 8
+
+    # Sub-requests appended to every bulk details request
+    APPEND_TO_RESPONSE = {
+        RecordType.MOVIE: ["credits", "external_ids", "images"],
+        RecordType.SERIES: ["credits", "external_ids", "images"],
+        RecordType.ARTIST: ["combined_credits", "external_ids", "images"],
+    }
+
+    # Response cache TTLs in seconds, RecordType.TMDB is the /configuration payload
+    RESPONSE_CACHE_TTLS = {
+        RecordType.TMDB: 7 * 24 * 60 * 60,
+        RecordType.MOVIE: 24 * 60 * 60,
+        RecordType.SERIES: 24 * 60 * 60,
+        RecordType.ARTIST: 3 * 24 * 60 * 60,
+    }
+
+    @property
+    def RESPONSE_CACHE_FILE_NAME(cls) -> Path:
+        cache_dir = Path(os.environ.get("MOVIE_FINDER_CACHE", Path(__file__).parent.resolve()))
+        return cache_dir / "tmdb_response_cache.sqlite"
+
+    def __init__(self, use_response_cache: bool = True) -> None:
+        self.response_cache = (
+            ResponseCache(self.RESPONSE_CACHE_FILE_NAME) if use_response_cache else None
+        )
         self.tmdb_config = self._get_tmdb_config()
         self.image_config = TmdbImageConfig(self.tmdb_config)
 
-    def _make_request(self, url):
-        response = requests.get(url)
+    @staticmethod
+    def _get_cache_key(url: str) -> str:
+        # The API key is not part of the resource, and should not be stored on disk
+        split_url = urlsplit(url)
+        query = [(key, value) for key, value in parse_qsl(split_url.query) if key != "api_key"]
+        return urlunsplit(split_url._replace(query=urlencode(query)))
+
+    def _make_request(self, url, record_type: RecordType = None):
+        """
+        Makes a GET request and returns the json body. Responses of the record
+        types in RESPONSE_CACHE_TTLS are served from the response cache while
+        fresh, and revalidated with ETag/Last-Modified once stale.
+        """
+        if self.response_cache is None or record_type not in self.RESPONSE_CACHE_TTLS:
+            response = self._request("GET", url)
+            response.raise_for_status()
+            return response.json()
+
+        cache_key = self._get_cache_key(url)
+        ttl = self.RESPONSE_CACHE_TTLS[record_type]
+        cached_response = self.response_cache.get(cache_key)
+        if cached_response is not None and cached_response.is_fresh:
+            return json.loads(cached_response.body)
+
+        headers = {}
+        if cached_response is not None:
+            if cached_response.etag:
+                headers["If-None-Match"] = cached_response.etag
+            if cached_response.last_modified:
+                headers["If-Modified-Since"] = cached_response.last_modified
+        response = self._request("GET", url, headers=headers)
+        if cached_response is not None and response.status_code == 304:
+            self.response_cache.refresh(cache_key, ttl)
+            return json.loads(cached_response.body)
         response.raise_for_status()
+        self.response_cache.put(
+            cache_key,
+            response.content,
+            response.headers.get("ETag"),
+            response.headers.get("Last-Modified"),
+            ttl,
+        )
         return response.json()
 
     def _get_tmdb_config(self) -> None:
         url = f"{self.URL_BASE}/configuration?api_key={self.AUTH_TOKEN}"
-        config_data = self._make_request(url)
+        config_data = self._make_request(url, record_type=RecordType.TMDB)
         return config_data
 
-    def _get_record_details(self, record_type: RecordType, tmdb_id: int):
+    def _get_record_details(
+        self, record_type: RecordType, tmdb_id: int, append_to_response: List[str] = None
+    ):
         url = f"{self.URL_BASE}/{record_type.value.lower()}/{tmdb_id}?api_key={self.AUTH_TOKEN}"
-        data = self._make_request(url)
+        if append_to_response:
+            url += f"&append_to_response={','.join(append_to_response)}"
+        data = self._make_request(url, record_type=record_type)
         return data
 
     def _generate_movie_record_from_response(self, movie_data: Dict[str, Any]) -> MovieRecord:
@@ -141,46 +557,141 @@ class TmdbConnector(ConnectorBase):
     def _generate_artist_record_from_response(self, artist_data: Dict[str, Any]) -> ArtistRecord:
         return ArtistRecord(**artist_data)
 
-    def _get_popular_n(self, num_records: int, record_type: RecordType):
-        url = f"{self.URL_BASE}/{record_type.value.lower()}/popular?api_key={self.AUTH_TOKEN}&page="
-        page = 1
-        data = []
-        while len(data < num_records):
-            response = requests.get(url + str(page))
-            data = response.json()
-            for item_data in data["results"]:
-                if record_type == RecordType.MOVIE:
-                    item_data = self._generate_movie_record_from_response(item_data)
-                elif record_type == RecordType.SERIES:
-                    item_data = self._generate_artist_record_from_response(item_data)
-                elif record_type == RecordType.ARTIST:
-                    item_data = self._generate_artist_record_from_response(item_data)
-                else:
-                    raise ValueError(f"Unsupported record type: {record_type}")
-                data.append(item_data)
-
-            if data["page"] == data["total_pages"]:
-                break
-            page += 1
-            time.sleep(2)
+    def _generate_record_from_response(
+        self, record_type: RecordType, item_data: Dict[str, Any]
+    ) -> Union[MovieRecord, SeriesRecord, ArtistRecord]:
+        if record_type == RecordType.MOVIE:
+            return self._generate_movie_record_from_response(item_data)
+        elif record_type == RecordType.SERIES:
+            return self._generate_series_record_from_response(item_data)
+        elif record_type == RecordType.ARTIST:
+            return self._generate_artist_record_from_response(item_data)
+        raise ValueError(f"Unsupported record type: {record_type}")
+
+    def _get_popular_n(
+        self, num_records: int, record_type: RecordType, max_workers: int = None
+    ) -> List[Union[MovieRecord, SeriesRecord, ArtistRecord]]:
+        """
+        Fetches the first page of the popular list, and then the remaining pages
+        needed to reach num_records concurrently within the TMDB rate limit
 
-        return data
+        Args:
+            num_records (int): Number of records to return
+            record_type (RecordType): One of MOVIE, SERIES or ARTIST
+            max_workers (int, optional): Number of concurrent page requests.
+                Defaults to MAX_WORKERS.
+
+        Returns:
+            List[Union[MovieRecord, SeriesRecord, ArtistRecord]]: Records in
+                descending popularity order
+        """
+        url = f"{self.URL_BASE}/{record_type.value.lower()}/popular?api_key={self.AUTH_TOKEN}&page="
+        first_page = self._make_request(url + "1")
+        page_size = max(len(first_page["results"]), 1)
+        num_pages = min(
+            math.ceil(num_records / page_size), first_page["total_pages"], self.POPULAR_MAX_PAGES
+        )
+        pages = [first_page]
+        if num_pages > 1:
+            with ThreadPoolExecutor(max_workers=max_workers or self.MAX_WORKERS) as executor:
+                pages.extend(
+                    executor.map(
+                        lambda page: self._make_request(url + str(page)), range(2, num_pages + 1)
+                    )
+                )
+
+        # Popularity may shift between page requests, so titles can appear on two pages
+        item_data_dict = {}
+        for page in pages:
+            for item_data in page["results"]:
+                item_data_dict.setdefault(item_data["id"], item_data)
+        item_data_list = sorted(
+            item_data_dict.values(),
+            key=lambda item_data: item_data.get("popularity") or 0,
+            reverse=True,
+        )
+        return [
+            self._generate_record_from_response(record_type, item_data)
+            for item_data in item_data_list[:num_records]
+        ]
 
     def get_movie_details(self, tmdb_id: int):
         data = self._get_record_details(RecordType.MOVIE, tmdb_id)
-        ipdb.set_trace()
         return self._generate_movie_record_from_response(data)
 
     def get_series_details(self, tmdb_id: int):
         data = self._get_record_details(RecordType.SERIES, tmdb_id)
-        ipdb.set_trace()
         return self._generate_series_record_from_response(data)
 
     def get_artist_details(self, tmdb_id: int):
         data = self._get_record_details(RecordType.ARTIST, tmdb_id)
-        ipdb.set_trace()
         return self._generate_artist_record_from_response(data)
 
+    def _get_full_record_details(
+        self, record_type: RecordType, tmdb_id: int
+    ) -> Union[MovieRecord, SeriesRecord, ArtistRecord]:
+        data = self._get_record_details(
+            record_type, tmdb_id, append_to_response=self.APPEND_TO_RESPONSE[record_type]
+        )
+        return self._generate_record_from_response(record_type, data)
+
+    def get_details_many(
+        self, record_type: RecordType, tmdb_ids: Iterable[int], max_workers: int = None
+    ) -> Iterator[Union[MovieRecord, SeriesRecord, ArtistRecord]]:
+        """
+        Fetches the details, credits, external ids and images of many titles,
+        one request per title using append_to_response, on a worker pool
+
+        Args:
+            record_type (RecordType): One of MOVIE, SERIES or ARTIST
+            tmdb_ids (Iterable[int]): TMDB ids to fetch
+            max_workers (int, optional): Number of concurrent requests.
+                Defaults to MAX_WORKERS.
+
+        Yields:
+            Union[MovieRecord, SeriesRecord, ArtistRecord]: Fully populated records
+                in completion order. Ids that fail are logged and skipped.
+        """
+        max_workers = max_workers or self.MAX_WORKERS
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            pending = {}
+            tmdb_id_iterator = iter(tmdb_ids)
+            while True:
+                # Keep at most two requests per worker submitted
+                for tmdb_id in itertools.islice(tmdb_id_iterator, 2 * max_workers - len(pending)):
+                    future = executor.submit(self._get_full_record_details, record_type, tmdb_id)
+                    pending[future] = tmdb_id
+                if not pending:
+                    break
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    tmdb_id = pending.pop(future)
+                    # Connection errors, timeouts and bad json only skip their own record
+                    try:
+                        record = future.result()
+                    except (RequestException, KeyError, ValueError) as e:
+                        logger.log(
+                            level=logging.WARNING,
+                            msg=f"Failed to get the {record_type.name} details of {tmdb_id}: {e}",
+                        )
+                        continue
+                    yield record
+
+    def get_movie_details_many(
+        self, tmdb_ids: Iterable[int], max_workers: int = None
+    ) -> Iterator[MovieRecord]:
+        return self.get_details_many(RecordType.MOVIE, tmdb_ids, max_workers=max_workers)
+
+    def get_series_details_many(
+        self, tmdb_ids: Iterable[int], max_workers: int = None
+    ) -> Iterator[SeriesRecord]:
+        return self.get_details_many(RecordType.SERIES, tmdb_ids, max_workers=max_workers)
+
+    def get_artist_details_many(
+        self, tmdb_ids: Iterable[int], max_workers: int = None
+    ) -> Iterator[ArtistRecord]:
+        return self.get_details_many(RecordType.ARTIST, tmdb_ids, max_workers=max_workers)
+
     def get_popular_n_movies(self, num_records: int) -> List[MovieRecord]:
         return self._get_popular_n(num_records, record_type=RecordType.MOVIE)
 
@@ -1,6 +1,11 @@
-import requests
 import os
 
+from db_connector.connector import generate_http_session
+from mf_representations.enums import UpstreamType
+from mf_utils.rate_limiter import get_rate_limiter
+
+session = generate_http_session()
+
 url = "https://streaming-availability.p.rapidapi.com/countries"
 
 headers = {
@@ -8,7 +13,7 @@ headers = {
     "X-RapidAPI-Host": "streaming-availability.p.rapidapi.com",
 }
 
-response = requests.request("GET", url, headers=headers)
+response = session.request("GET", url, headers=headers)
 
 print(response.text)
 import ipdb
@@ -16,11 +21,6 @@ import ipdb
 ipdb.set_trace()
 
 
-import requests
-import os
-import time
-
-
 def retrieve_movie_names_and_ids():
     api_key = os.environ["TMDB_API_KEY"]
     url = f"https://api.themoviedb.org/3/movie/popular?api_key={api_key}&page="
@@ -28,14 +28,16 @@ def retrieve_movie_names_and_ids():
     page = 1
     movies = []
 
+    rate_limiter = get_rate_limiter(UpstreamType.TMDB)
     while True:
-        response = requests.get(url + str(page))
+        rate_limiter.acquire()
+        response = session.get(url + str(page))
+        rate_limiter.update_from_headers(response.status_code, response.headers)
         data = response.json()
         movies.extend(data["results"])
         if data["page"] == data["total_pages"]:
             break
         page += 1
-        time.sleep(5)
 
     movie_names_and_ids = []
 
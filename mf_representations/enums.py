@@ -1,10 +1,11 @@
 import ipdb
 import datetime
+import numpy as np
 
 from enum import Enum
-from dataclasses import dataclass, asdict
+from dataclasses import dataclass, asdict, field
 
-from typing import List, Dict, Any
+from typing import List, Dict, Any, NamedTuple
 
 
 class RecordType(Enum):
@@ -18,6 +19,48 @@ class RecordType(Enum):
     ARTIST = "person"
     NETWORK = "network"
 
+    @property
+    def code(self) -> int:
+        """
+        Small integer code of the record type in columnar tables
+        """
+        return _RECORD_TYPE_INDEX[self]
+
+
+_RECORD_TYPE_INDEX = {record_type: index for index, record_type in enumerate(RecordType)}
+
+
+class UpstreamType(Enum):
+    """
+    Upstream APIs that share a rate limit across connectors
+    """
+
+    TMDB = "tmdb"
+    RAPID = "rapid"
+    SUPABASE = "supabase"
+
+
+class TmdbExportRow(NamedTuple):
+    """
+    Single parsed row of a TMDB daily id export
+    """
+
+    tmdb_id: int
+    title: str
+    popularity: float
+    type: RecordType
+
+
+class AvailabilityRefreshItem(NamedTuple):
+    """
+    Work item of the availability refresh scheduler
+    """
+
+    tmdb_id: int
+    record_type: RecordType
+    country: str
+    popularity: float = 0.0
+
 
 @dataclass
 class SupaMainData:
@@ -32,6 +75,125 @@ class SupaMainData:
         return dict_to_return
 
 
+@dataclass
+class SupaBatchResult:
+    """
+    Outcome of a single bulk upsert batch
+    """
+
+    batch_index: int
+    num_records: int
+    num_succeeded: int
+    num_failed: int
+    elapsed_sec: float
+    error: str = None
+
+
+@dataclass
+class SupaBulkReport:
+    """
+    Per-batch outcomes of a bulk upsert run
+    """
+
+    batches: List[SupaBatchResult] = field(default_factory=list)
+
+    @property
+    def num_succeeded(self) -> int:
+        return sum(batch.num_succeeded for batch in self.batches)
+
+    @property
+    def num_failed(self) -> int:
+        return sum(batch.num_failed for batch in self.batches)
+
+    @property
+    def records_per_sec(self) -> float:
+        elapsed_sec = sum(batch.elapsed_sec for batch in self.batches)
+        num_records = sum(batch.num_records for batch in self.batches)
+        return num_records / elapsed_sec if elapsed_sec > 0 else 0.0
+
+
+@dataclass
+class IngestSummary:
+    """
+    Bulk upsert reports and wall clock times of an ingest run per record type
+    """
+
+    reports: Dict[RecordType, SupaBulkReport] = field(default_factory=dict)
+    wall_time_sec: Dict[RecordType, float] = field(default_factory=dict)
+
+    def records_per_sec(self, record_type: RecordType) -> float:
+        wall_time_sec = self.wall_time_sec.get(record_type, 0.0)
+        if wall_time_sec <= 0:
+            return 0.0
+        report = self.reports[record_type]
+        return sum(batch.num_records for batch in report.batches) / wall_time_sec
+
+
+@dataclass
+class TmdbExportDelta:
+    """
+    Difference between two daily TMDB export snapshots of a single record type.
+    The snapshot arrays hold today's sorted ids and popularities, and are stored
+    as the new previous snapshot once the delta is applied.
+    """
+
+    record_type: RecordType
+    added: List[TmdbExportRow]
+    removed_ids: np.ndarray
+    popularity_changes: List[TmdbExportRow]
+    snapshot_ids: np.ndarray
+    snapshot_popularity: np.ndarray
+
+
+@dataclass
+class TmdbExportColumns:
+    """
+    Typed column buffers of a batch of parsed TMDB export lines. Popularity is
+    kept in double precision, so that the values stored in the main table are
+    the exported ones; only the on-disk formats narrow it to float32.
+    """
+
+    tmdb_ids: np.ndarray = field(default_factory=lambda: np.empty(0, dtype=np.int32))
+    titles: List[str] = field(default_factory=list)
+    popularity: np.ndarray = field(default_factory=lambda: np.empty(0, dtype=np.float64))
+    num_malformed: int = 0
+
+    def __len__(self) -> int:
+        return len(self.tmdb_ids)
+
+    @classmethod
+    def concat(cls, columns_list: List["TmdbExportColumns"]) -> "TmdbExportColumns":
+        if not columns_list:
+            return cls()
+        return cls(
+            tmdb_ids=np.concatenate([columns.tmdb_ids for columns in columns_list]),
+            titles=[title for columns in columns_list for title in columns.titles],
+            popularity=np.concatenate([columns.popularity for columns in columns_list]),
+            num_malformed=sum(columns.num_malformed for columns in columns_list),
+        )
+
+    def drop_empty_titles(self) -> "TmdbExportColumns":
+        title_lengths = np.fromiter(map(len, self.titles), dtype=np.int64, count=len(self.titles))
+        keep = np.flatnonzero(title_lengths > 0)
+        if len(keep) == len(self.titles):
+            return self
+        return TmdbExportColumns(
+            tmdb_ids=self.tmdb_ids[keep],
+            titles=[self.titles[i] for i in keep],
+            popularity=self.popularity[keep],
+            num_malformed=self.num_malformed,
+        )
+
+
+class ExportFormat(Enum):
+    """
+    Output file formats for the TMDB id/title export
+    """
+
+    CSV = "csv"
+    PARQUET = "parquet"
+
+
 class PlatformType(Enum):
     """
     List of available platforms on RapidAPI
@@ -52,6 +214,23 @@ class PlatformType(Enum):
     def get_all_platform_list(self) -> List[str]:
         return [item.value.lower() for item in self]
 
+    @property
+    def code(self) -> int:
+        """
+        Small integer code of the platform in columnar tables
+        """
+        return _PLATFORM_INDEX[self]
+
+    @property
+    def bit(self) -> int:
+        """
+        Single bit of the platform in country/platform bitmasks
+        """
+        return 1 << _PLATFORM_INDEX[self]
+
+
+_PLATFORM_INDEX = {platform: index for index, platform in enumerate(PlatformType)}
+
 
 @dataclass
 class StreamingInfoCountry:
@@ -84,41 +263,49 @@ class RapidPlatformInfoCountry:
     streaming_info: List[StreamingInfoCountry] = None
 
     def generate_streaming_info_from_rapid(
-        self, data_dict: Dict[str, Any], country: str
-    ) -> StreamingInfoCountry:
+        self, data_dict: Dict[str, Any], record_type: RecordType = None
+    ) -> List[StreamingInfoCountry]:
         if data_dict.get("streamingInfo") is None:
             return None
         streaming_info_list = []
-        for platform in data_dict["streamingInfo"].keys():
-            platform_type = PlatformType(platform)
-            link = data_dict["streamingInfo"][platform][country]["link"]
-            added_time = datetime.datetime.fromtimestamp(
-                data_dict["streamingInfo"][platform][country]["added"]
-            )
-            leaving_time = data_dict["streamingInfo"][platform][country]["leaving"]
-            leaving_time = (
-                datetime.datetime.fromtimestamp(leaving_time) if leaving_time > 0 else None
-            )
-            streaming_info_list.append(
-                StreamingInfoCountry(
-                    platform=platform_type,
-                    country=country,
-                    link=link,
-                    added=added_time,
-                    leaving=leaving_time,
+        for platform, country_infos in data_dict["streamingInfo"].items():
+            try:
+                platform_type = PlatformType(platform)
+            except ValueError:
+                continue
+            for country, info in (country_infos or {}).items():
+                added_time = info.get("added") or 0
+                leaving_time = info.get("leaving") or 0
+                streaming_info_list.append(
+                    StreamingInfoCountry(
+                        tmdb_id=self.tmdb_id,
+                        record_type=record_type,
+                        platform=platform_type,
+                        country=country.lower(),
+                        link=info.get("link"),
+                        added=(
+                            datetime.datetime.fromtimestamp(added_time) if added_time > 0 else None
+                        ),
+                        leaving=(
+                            datetime.datetime.fromtimestamp(leaving_time)
+                            if leaving_time > 0
+                            else None
+                        ),
+                    )
                 )
-            )
         return streaming_info_list
 
-    def generate_data_from_rapid(self, data_dict: Dict[str, Any]) -> None:
+    def generate_data_from_rapid(
+        self, data_dict: Dict[str, Any], tmdb_id: int = None, record_type: RecordType = None
+    ) -> None:
         self.imdb_id = data_dict["imdbID"]
         self.imdb_rating = data_dict["imdbRating"]
         self.imdb_vote_count = data_dict["imdbVoteCount"]
-        self.tmdb_id = data_dict["tmdbID"]
+        self.tmdb_id = tmdb_id if tmdb_id is not None else data_dict["tmdbID"]
         self.tmdb_rating = data_dict["tmdbRating"]
         self.title = data_dict["title"]
         self.genre_ids = data_dict["genres"]
-        self.country = data_dict["countries"][0]
+        self.country = next(iter(data_dict.get("countries") or []), None)
         self.year = data_dict["year"]
         self.runtime = data_dict["runtime"]
         self.cast = data_dict["cast"]
@@ -126,6 +313,87 @@ class RapidPlatformInfoCountry:
         self.overview = data_dict["overview"]
         self.tagline = data_dict["tagline"]
         self.viewer_age = data_dict["age"]
-        self.streaming_info = self.generate_streaming_info_from_rapid(
-            data_dict, country=self.country.lower()
+        self.streaming_info = self.generate_streaming_info_from_rapid(data_dict, record_type)
+
+
+@dataclass
+class AvailabilityTable:
+    """
+    Columnar availability rows of many titles, countries and platforms.
+    Record types and platforms are stored as their codes, and added/leaving
+    as epoch seconds, where 0 means unknown or not leaving.
+    """
+
+    tmdb_ids: np.ndarray = field(default_factory=lambda: np.empty(0, dtype=np.int32))
+    record_types: np.ndarray = field(default_factory=lambda: np.empty(0, dtype=np.int8))
+    countries: np.ndarray = field(default_factory=lambda: np.empty(0, dtype="U2"))
+    platforms: np.ndarray = field(default_factory=lambda: np.empty(0, dtype=np.int8))
+    added: np.ndarray = field(default_factory=lambda: np.empty(0, dtype=np.int64))
+    leaving: np.ndarray = field(default_factory=lambda: np.empty(0, dtype=np.int64))
+    links: List[str] = field(default_factory=list)
+
+    def __len__(self) -> int:
+        return len(self.tmdb_ids)
+
+    @staticmethod
+    def _to_epoch(value: datetime.datetime) -> int:
+        return int(value.timestamp()) if value is not None else 0
+
+    @classmethod
+    def from_streaming_info(
+        cls,
+        streaming_info_list: List[StreamingInfoCountry],
+        tmdb_id: int = None,
+        record_type: RecordType = None,
+    ) -> "AvailabilityTable":
+        """
+        Builds the table from parsed RapidAPI rows. tmdb_id and record_type,
+        if given, override the ones of the rows.
+        """
+        streaming_info_list = streaming_info_list or []
+        return cls(
+            tmdb_ids=np.array(
+                [tmdb_id or info.tmdb_id for info in streaming_info_list], dtype=np.int32
+            ),
+            record_types=np.array(
+                [(record_type or info.record_type).code for info in streaming_info_list],
+                dtype=np.int8,
+            ),
+            countries=np.array([info.country for info in streaming_info_list], dtype="U2"),
+            platforms=np.array([info.platform.code for info in streaming_info_list], dtype=np.int8),
+            added=np.array(
+                [cls._to_epoch(info.added) for info in streaming_info_list], dtype=np.int64
+            ),
+            leaving=np.array(
+                [cls._to_epoch(info.leaving) for info in streaming_info_list], dtype=np.int64
+            ),
+            links=[info.link for info in streaming_info_list],
         )
+
+    @classmethod
+    def concat(cls, tables: List["AvailabilityTable"]) -> "AvailabilityTable":
+        if not tables:
+            return cls()
+        return cls(
+            tmdb_ids=np.concatenate([table.tmdb_ids for table in tables]),
+            record_types=np.concatenate([table.record_types for table in tables]),
+            countries=np.concatenate([table.countries for table in tables]),
+            platforms=np.concatenate([table.platforms for table in tables]),
+            added=np.concatenate([table.added for table in tables]),
+            leaving=np.concatenate([table.leaving for table in tables]),
+            links=[link for table in tables for link in table.links],
+        )
+
+
+@dataclass
+class RapidPlatformInfoResult:
+    """
+    Outcome of a single platform info request of a batch. Either
+    platform_info or error is set.
+    """
+
+    tmdb_id: int
+    record_type: RecordType
+    country: str
+    platform_info: RapidPlatformInfoCountry = None
+    error: str = None
@@ -1,19 +1,40 @@
-from copy import deepcopy
-import dateutil
+import dateutil.parser
 import datetime
 import dataclasses
 import abc
 
-from typing import List
+from typing import List, Dict, Any
 
 from mf_representations.enums import RecordType
 
 
+def parse_date(date_string: str) -> datetime.datetime:
+    """
+    Function for parsing TMDB dates, which are ISO "YYYY-MM-DD" strings.
+    Falls back to dateutil for any other format.
+
+    Args:
+        date_string (str): Date string, might be empty or None
+
+    Returns:
+        datetime.datetime: Parsed date or None
+    """
+    if not date_string:
+        return None
+    try:
+        return datetime.datetime.fromisoformat(date_string)
+    except ValueError:
+        return dateutil.parser.parse(date_string)
+
+
 class RecordBase(abc.ABC):
     """
-    Base class for all type of movie, actor, genre, tmdb records
+    Base class for all type of movie, actor, genre, tmdb records.
+    Records are slotted, and their DB dictionary is only built when requested.
     """
 
+    __slots__ = ()
+
     @abc.abstractproperty
     @classmethod
     def RECORD_TYPE(cls) -> str:
@@ -31,12 +52,32 @@ class RecordBase(abc.ABC):
         self.record_id = record_id
         self.unique_id = self.RECORD_TYPE + self.record_id
 
+    def _to_dict(self) -> Dict[str, Any]:
+        """
+        Creates the DB dictionary of the record so that we can push it
+
+        Returns:
+            Dict[str, Any]: Attributes of the record
+        """
+        return {
+            slot: getattr(self, slot)
+            for cls in reversed(type(self).__mro__)
+            for slot in getattr(cls, "__slots__", ())
+            if hasattr(self, slot)
+        }
+
+    @property
+    def _data_dict(self) -> Dict[str, Any]:
+        return self._to_dict()
+
 
 class TmdbRecord(RecordBase):
     """
     Class for generating TMDB record objects
     """
 
+    __slots__ = ("record_name", "record_id", "unique_id")
+
     @property
     def RECORD_TYPE(cls) -> str:
         return RecordType.TMDB
@@ -50,6 +91,28 @@ class MovieRecord(RecordBase):
     Class for generating Movie record objects
     """
 
+    __slots__ = (
+        "title",
+        "tmdb_id",
+        "popularity",
+        "vote_avg",
+        "vote_count",
+        "backdrop_path",
+        "poster_path",
+        "description",
+        "overview",
+        "tagline",
+        "runtime",
+        "release_date",
+        "release_status",
+        "genres",
+        "video",
+        "meta_data",
+        "credits",
+        "external_ids",
+        "images",
+    )
+
     @property
     def RECORD_TYPE(cls) -> str:
         return RecordType.MOVIE
@@ -58,19 +121,15 @@ class MovieRecord(RecordBase):
         self.title: str = kwargs["title"]
         self.tmdb_id: int = kwargs["id"]
         self.popularity: float = kwargs.get("popularity")
-        self.vote_avg: float = kwargs.get("vote_count")
-        self.vote_count: int = kwargs.get("vote_average")
+        self.vote_avg: float = kwargs.get("vote_average")
+        self.vote_count: int = kwargs.get("vote_count")
         self.backdrop_path: str = kwargs.get("backdrop_path")
         self.poster_path: str = kwargs.get("poster_path")
         self.description: str = kwargs.get("description")
         self.overview: str = kwargs.get("overview")
         self.tagline: str = kwargs.get("tagline")
         self.runtime: int = kwargs.get("runtime")
-        self.release_date: datetime = (
-            dateutil.parser.parse(kwargs.get("release_date"))
-            if kwargs.get("release_date")
-            else None
-        )
+        self.release_date: datetime = parse_date(kwargs.get("release_date"))
         self.release_status: str = kwargs.get("release_status")
         self.genres: List[dict] = kwargs.get("genres")
         self.video: bool = kwargs.get("video")
@@ -87,9 +146,9 @@ class MovieRecord(RecordBase):
             "revenue": kwargs.get("revenue"),
             "spoken_languages": kwargs.get("spoken_languages"),
         }
-
-        # Create DB dictionary here so that we can push it later
-        self._data_dict = deepcopy(self.__dict__)
+        self.credits: dict = kwargs.get("credits")
+        self.external_ids: dict = kwargs.get("external_ids")
+        self.images: dict = kwargs.get("images")
 
 
 class SeriesRecord(RecordBase):
@@ -97,6 +156,27 @@ class SeriesRecord(RecordBase):
     Class for generating Series record objects
     """
 
+    __slots__ = (
+        "title",
+        "tmdb_id",
+        "popularity",
+        "vote_avg",
+        "vote_count",
+        "backdrop_path",
+        "poster_path",
+        "overview",
+        "tagline",
+        "episode_run_time",
+        "first_air_date",
+        "genres",
+        "networks",
+        "release_status",
+        "meta_data",
+        "credits",
+        "external_ids",
+        "images",
+    )
+
     @property
     def RECORD_TYPE(cls) -> str:
         return RecordType.SERIES
@@ -112,11 +192,7 @@ class SeriesRecord(RecordBase):
         self.overview: str = kwargs.get("overview")
         self.tagline: str = kwargs.get("tagline")
         self.episode_run_time: int = kwargs.get("episode_run_time")
-        self.first_air_date: datetime = (
-            dateutil.parser.parse(kwargs.get("first_air_date"))
-            if kwargs.get("first_air_date")
-            else None
-        )
+        self.first_air_date: datetime = parse_date(kwargs.get("first_air_date"))
         self.genres: dict = kwargs.get("genres")
         self.networks: dict = kwargs.get("networks")
         self.release_status: str = kwargs.get("status")
@@ -126,9 +202,7 @@ class SeriesRecord(RecordBase):
             "homepage": kwargs.get("homepage"),
             "in_production": kwargs.get("in_production"),
             "languages": kwargs.get("languages"),
-            "last_air_date": dateutil.parser.parse(kwargs.get("last_air_date"))
-            if kwargs.get("last_air_date")
-            else None,
+            "last_air_date": parse_date(kwargs.get("last_air_date")),
             "last_episode_to_air": kwargs.get("last_episode_to_air"),
             "next_episode_to_air": kwargs.get("next_episode_to_air"),
             "number_of_episodes": kwargs.get("number_of_episodes"),
@@ -142,9 +216,9 @@ class SeriesRecord(RecordBase):
             "spoken_language": kwargs.get("spoken_language"),
             "type": kwargs.get("type"),
         }
-
-        # Create DB dictionary here so that we can push it later
-        self._data_dict = deepcopy(self.__dict__)
+        self.credits: dict = kwargs.get("credits")
+        self.external_ids: dict = kwargs.get("external_ids")
+        self.images: dict = kwargs.get("images")
 
 
 class ArtistRecord(RecordBase):
@@ -152,6 +226,18 @@ class ArtistRecord(RecordBase):
     Class for generating people/actor/actress/director objects
     """
 
+    __slots__ = (
+        "tmdb_id",
+        "title",
+        "popularity",
+        "imdb_id",
+        "biography",
+        "meta_data",
+        "credits",
+        "external_ids",
+        "images",
+    )
+
     @property
     def RECORD_TYPE(cls) -> str:
         return RecordType.ARTIST
@@ -171,9 +257,9 @@ class ArtistRecord(RecordBase):
             "known_for_department": kwargs.get("known_for_department"),
             "place_of_birth": kwargs.get("place_of_birth"),
         }
-
-        # Create DB dictionary here so that we can push it later
-        self._data_dict = deepcopy(self.__dict__)
+        self.credits = kwargs.get("combined_credits")
+        self.external_ids = kwargs.get("external_ids")
+        self.images = kwargs.get("images")
 
 
 class NetworkRecord(RecordBase):
@@ -183,6 +269,8 @@ class NetworkRecord(RecordBase):
     This class probably will not be used for now
     """
 
+    __slots__ = ("record_name", "record_id", "unique_id")
+
     @property
     def RECORD_TYPE(cls) -> str:
         return RecordType.NETWORK
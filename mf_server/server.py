@@ -1,8 +1,17 @@
 import os
+import time
+import threading
 from pathlib import Path
 from flask import Flask, request, jsonify
+from requests.exceptions import RequestException
 
 from mf_server.config import token_required
+from mf_representations.enums import RecordType, PlatformType
+from db_connector.availability_store import AvailabilityStore
+from db_connector.rapid_connector import RapidConnector
+from mf_utils.title_search import TrigramIndex
+from mf_utils.autocomplete import AutocompleteIndex
+from mf_utils.title_store import TitleStore
 
 from mf_utils import logger_setup
 
@@ -11,11 +20,227 @@ logger = logger_setup.get_logger()
 
 app = Flask(__name__)
 
+MAX_BATCH_SIZE = 500
+# Upper bound of live RapidAPI calls per request for ids missing in the store
+MAX_UPSTREAM_FETCHES = 10
+MAX_PAGE_SIZE = 100
+MAX_RANGE_DAYS = 90
 
-@app.route("/get_available", methods=["GET"])
+availability_store = AvailabilityStore(
+    Path(os.environ.get("MF_AVAILABILITY_STORE", "availability_store.sqlite"))
+)
+# Memory-mapped read-only, so that all workers share one page cache copy
+title_store_file_name = Path(os.environ.get("MF_TITLE_STORE", "all_id_titles.mfts"))
+title_store = TitleStore(title_store_file_name) if title_store_file_name.exists() else None
+_rapid_connector = None
+_title_index = None
+_title_index_lock = threading.Lock()
+_autocomplete_index = None
+_autocomplete_index_lock = threading.Lock()
+
+
+def get_rapid_connector() -> RapidConnector:
+    global _rapid_connector
+    if _rapid_connector is None:
+        _rapid_connector = RapidConnector()
+    return _rapid_connector
+
+
+def get_title_index() -> TrigramIndex:
+    # Built from the id/title export on first use, once per worker
+    global _title_index
+    with _title_index_lock:
+        if _title_index is None and title_store is not None:
+            logger.info(f"Building the title search index from {title_store.file_name}...")
+            _title_index = TrigramIndex.from_title_store(title_store)
+        elif _title_index is None:
+            export_file_name = Path(os.environ.get("MF_TITLE_EXPORT", "all_id_titles.parquet"))
+            logger.info(f"Building the title search index from {export_file_name}...")
+            _title_index = TrigramIndex.from_export(export_file_name)
+    return _title_index
+
+
+def get_autocomplete_index() -> AutocompleteIndex:
+    # Built from the title store or the id/title export on first use, once per worker
+    global _autocomplete_index
+    with _autocomplete_index_lock:
+        if _autocomplete_index is None and title_store is not None:
+            logger.info(f"Building the autocomplete index from {title_store.file_name}...")
+            _autocomplete_index = AutocompleteIndex.from_title_store(title_store)
+        elif _autocomplete_index is None:
+            export_file_name = Path(os.environ.get("MF_TITLE_EXPORT", "all_id_titles.parquet"))
+            logger.info(f"Building the autocomplete index from {export_file_name}...")
+            _autocomplete_index = AutocompleteIndex.from_export(export_file_name)
+    return _autocomplete_index
+
+
+def _parse_ids(ids):
+    """
+    Parses ids given either as a list of {"tmdb_id": ..., "type": ...} objects
+    or as a "type:tmdb_id,type:tmdb_id" string, e.g. "movie:603,series:1399"
+    """
+    if isinstance(ids, str):
+        ids = [
+            {"type": item.split(":")[0], "tmdb_id": item.split(":")[1]}
+            for item in ids.split(",")
+            if item
+        ]
+    return [(int(item["tmdb_id"]), RecordType[item["type"].upper()]) for item in ids]
+
+
+@app.route("/get_available", methods=["GET", "POST"])
 @token_required
 def get_available():
-    pass
+    payload = request.get_json(silent=True) or {}
+    country = (payload.get("country") or request.args.get("country", "us")).lower()
+    fetch_missing = payload.get("fetch_missing", request.args.get("fetch_missing", "true"))
+    # A JSON body may send the flag as a boolean or as the same string as the query
+    fetch_missing = (
+        fetch_missing.lower() == "true" if isinstance(fetch_missing, str) else bool(fetch_missing)
+    )
+    try:
+        keys = _parse_ids(payload.get("ids") or request.args.get("ids", ""))
+    except (KeyError, ValueError, IndexError, TypeError, AttributeError):
+        return jsonify({"message": "Invalid ids!"}), 400
+    if len(keys) > MAX_BATCH_SIZE:
+        return jsonify({"message": f"At most {MAX_BATCH_SIZE} ids are allowed!"}), 400
+
+    platforms, missing_keys = availability_store.get_many(keys, country)
+    if fetch_missing:
+        for tmdb_id, record_type in missing_keys[:MAX_UPSTREAM_FETCHES]:
+            try:
+                platform_info = get_rapid_connector().get_platform_info(
+                    tmdb_id, record_type, country=country
+                )
+            except (RequestException, KeyError, ValueError, TypeError) as e:
+                logger.warning(f"Failed to fetch availability of {record_type.name} {tmdb_id}: {e}")
+                continue
+            availability_store.put_platform_info(tmdb_id, record_type, country, platform_info)
+        platforms, missing_keys = availability_store.get_many(keys, country)
+
+    return jsonify(
+        {
+            "country": country,
+            "results": [
+                {
+                    "tmdb_id": tmdb_id,
+                    "type": record_type.name,
+                    "title": title_store.get_title(record_type, tmdb_id) if title_store else None,
+                    "platforms": key_platforms,
+                }
+                for (tmdb_id, record_type), key_platforms in platforms.items()
+            ],
+            "missing": [
+                {"tmdb_id": tmdb_id, "type": record_type.name}
+                for tmdb_id, record_type in missing_keys
+            ],
+        }
+    )
+
+
+@app.route("/titles", methods=["GET", "POST"])
+@token_required
+def titles():
+    if title_store is None:
+        return jsonify({"message": "Title store is not available!"}), 503
+    payload = request.get_json(silent=True) or {}
+    try:
+        keys = _parse_ids(payload.get("ids") or request.args.get("ids", ""))
+    except (KeyError, ValueError, IndexError, TypeError, AttributeError):
+        return jsonify({"message": "Invalid ids!"}), 400
+    return jsonify(
+        {
+            "results": [
+                {
+                    "tmdb_id": tmdb_id,
+                    "type": record_type.name,
+                    "title": title_store.get_title(record_type, tmdb_id),
+                }
+                for tmdb_id, record_type in keys[:MAX_BATCH_SIZE]
+            ]
+        }
+    )
+
+
+@app.route("/search", methods=["GET"])
+@token_required
+def search():
+    query = request.args.get("q", "").strip()
+    if not query:
+        return jsonify({"message": "Query is missing!"}), 400
+    try:
+        k = min(int(request.args.get("k", 10)), 100)
+        if k < 1:
+            raise ValueError(f"Invalid number of results: {k}")
+        record_type = RecordType[request.args["type"].upper()] if "type" in request.args else None
+    except (KeyError, ValueError):
+        return jsonify({"message": "Invalid parameters!"}), 400
+    return jsonify({"query": query, "results": get_title_index().search(query, k, record_type)})
+
+
+@app.route("/autocomplete", methods=["GET"])
+@token_required
+def autocomplete():
+    query = request.args.get("q", "").strip()
+    try:
+        k = int(request.args.get("k", 10))
+        if k < 1:
+            raise ValueError(f"Invalid number of results: {k}")
+        record_type = RecordType[request.args["type"].upper()] if "type" in request.args else None
+    except (KeyError, ValueError):
+        return jsonify({"message": "Invalid parameters!"}), 400
+    return jsonify(
+        {"query": query, "results": get_autocomplete_index().complete(query, k, record_type)}
+    )
+
+
+def _time_range_response(get_range, leaving: bool):
+    """
+    Shared handler of the leaving soon and recently added endpoints. The range
+    covers the next `days` days for leaving, and the past `days` days for added.
+    """
+    try:
+        platform = PlatformType(request.args["platform"].lower())
+        country = request.args.get("country", "us").lower()
+        days = min(float(request.args.get("days", 7)), MAX_RANGE_DAYS)
+        limit = min(int(request.args.get("limit", 50)), MAX_PAGE_SIZE)
+        if limit < 1:
+            raise ValueError(f"Invalid page size: {limit}")
+        cursor = request.args.get("cursor") or None
+        now = int(time.time())
+        start, end = (now, now + int(days * 86400)) if leaving else (now - int(days * 86400), now)
+        rows, next_cursor = get_range(platform, country, start, end, limit, cursor)
+    except (KeyError, ValueError):
+        return jsonify({"message": "Invalid parameters!"}), 400
+    return jsonify(
+        {
+            "platform": platform.value,
+            "country": country,
+            "results": [
+                {
+                    **row,
+                    "type": row["type"].name,
+                    "title": (
+                        title_store.get_title(row["type"], row["tmdb_id"]) if title_store else None
+                    ),
+                }
+                for row in rows
+            ],
+            "next_cursor": next_cursor,
+        }
+    )
+
+
+@app.route("/leaving_soon", methods=["GET"])
+@token_required
+def leaving_soon():
+    return _time_range_response(availability_store.get_leaving, leaving=True)
+
+
+@app.route("/recently_added", methods=["GET"])
+@token_required
+def recently_added():
+    return _time_range_response(availability_store.get_added, leaving=False)
 
 
 if __name__ == "__main__":
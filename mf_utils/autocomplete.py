@@ -0,0 +1,181 @@
+import bisect
+import numpy as np
+
+from pathlib import Path
+from typing import Dict, List, Any
+
+from mf_representations.enums import RecordType
+from mf_utils.title_search import normalize_title, load_export
+
+RECORD_TYPES = list(RecordType)
+
+
+class CompletionTrie:
+    """
+    Completion trie over the normalized titles of a single record type, in
+    which every prefix node stores its precomputed top-k titles by popularity.
+    Only nodes with more than k titles are materialized, as a dict from the
+    prefix to a row of the top-k array. The titles below any other prefix fit
+    in k, so they are read from the sorted title list directly. Either way a
+    lookup never scans more than k titles, however many share the prefix.
+    """
+
+    def __init__(
+        self, tmdb_ids: np.ndarray, titles: List[str], popularity: np.ndarray, k: int = 10
+    ) -> None:
+        self.k = k
+        normalized_titles = [normalize_title(title) for title in titles]
+        order = sorted(range(len(titles)), key=normalized_titles.__getitem__)
+        self.sorted_titles = [normalized_titles[i] for i in order]
+        self.tmdb_ids = np.asarray(tmdb_ids, dtype=np.int32)[order]
+        self.titles = [titles[i] for i in order]
+        self.popularity = np.asarray(popularity, dtype=np.float32)[order]
+        self._build()
+
+    def _top_k(self, lo: int, hi: int) -> np.ndarray:
+        popularity = self.popularity[lo:hi]
+        if hi - lo > self.k:
+            top = np.argpartition(-popularity, self.k)[: self.k]
+        else:
+            top = np.arange(hi - lo)
+        return lo + top[np.argsort(-popularity[top], kind="stable")]
+
+    def _build(self) -> None:
+        node_rows: Dict[str, int] = {}
+        top_k_rows = []
+        stack = [(0, 0, len(self.sorted_titles))]
+        while stack:
+            depth, lo, hi = stack.pop()
+            if hi - lo <= self.k:
+                continue
+            prefix = self.sorted_titles[lo][:depth]
+            node_rows[prefix] = len(top_k_rows)
+            top_k_rows.append(self._top_k(lo, hi))
+            # Titles equal to the prefix sort first and have no child node
+            start = lo
+            while start < hi and len(self.sorted_titles[start]) == depth:
+                start += 1
+            while start < hi:
+                next_char = self.sorted_titles[start][depth]
+                end = bisect.bisect_left(
+                    self.sorted_titles, prefix + chr(ord(next_char) + 1), start, hi
+                )
+                stack.append((depth + 1, start, end))
+                start = end
+        self.node_rows = node_rows
+        self.top_k = (
+            np.stack(top_k_rows).astype(np.int32)
+            if top_k_rows
+            else np.empty((0, self.k), dtype=np.int32)
+        )
+
+    def complete(self, prefix: str, k: int = None) -> List[Dict[str, Any]]:
+        """
+        Returns the most popular titles starting with the normalized prefix
+
+        Args:
+            prefix (str): Normalized prefix
+            k (int, optional): Number of results, at most the k of the trie.
+                Defaults to the k of the trie.
+
+        Returns:
+            List[Dict[str, Any]]: Titles in descending popularity order
+        """
+        k = min(k or self.k, self.k)
+        row = self.node_rows.get(prefix)
+        if row is not None:
+            positions = self.top_k[row]
+        else:
+            lo = bisect.bisect_left(self.sorted_titles, prefix)
+            hi = lo
+            while hi < len(self.sorted_titles) and self.sorted_titles[hi].startswith(prefix):
+                hi += 1
+            positions = self._top_k(lo, hi)
+        return [
+            {
+                "tmdb_id": int(self.tmdb_ids[position]),
+                "title": self.titles[position],
+                "popularity": float(self.popularity[position]),
+            }
+            for position in positions[:k]
+        ]
+
+
+class AutocompleteIndex:
+    """
+    Popularity ranked as-you-type suggestions with one completion trie per
+    record type. Unfiltered queries merge the top-k of every type.
+    """
+
+    def __init__(
+        self,
+        tmdb_ids: np.ndarray,
+        titles: List[str],
+        popularity: np.ndarray,
+        record_types: np.ndarray,
+        k: int = 10,
+    ) -> None:
+        self.k = k
+        tmdb_ids = np.asarray(tmdb_ids, dtype=np.int32)
+        popularity = np.asarray(popularity, dtype=np.float32)
+        record_types = np.asarray(record_types, dtype=np.int8)
+        self.tries: Dict[RecordType, CompletionTrie] = {}
+        for type_index in np.unique(record_types):
+            positions = np.flatnonzero(record_types == type_index)
+            self.tries[RECORD_TYPES[type_index]] = CompletionTrie(
+                tmdb_ids[positions],
+                [titles[position] for position in positions],
+                popularity[positions],
+                k=k,
+            )
+
+    @classmethod
+    def from_export(cls, file_name: Path, k: int = 10) -> "AutocompleteIndex":
+        df = load_export(file_name)
+        type_codes = {record_type.name: code for code, record_type in enumerate(RECORD_TYPES)}
+        return cls(
+            tmdb_ids=df["tmdb_id"].to_numpy(),
+            titles=df["title"].astype(str).tolist(),
+            popularity=df["popularity"].to_numpy(),
+            record_types=df["type"].astype(str).map(type_codes).to_numpy(),
+            k=k,
+        )
+
+    @classmethod
+    def from_title_store(cls, title_store: "TitleStore", k: int = 10) -> "AutocompleteIndex":
+        tmdb_ids, titles, popularity, record_types = title_store.get_columns()
+        return cls(tmdb_ids, titles, popularity, record_types, k=k)
+
+    def complete(
+        self, query: str, k: int = None, record_type: RecordType = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Returns the most popular titles starting with the query
+
+        Args:
+            query (str): Typed text
+            k (int, optional): Number of results. Defaults to the k of the index.
+            record_type (RecordType, optional): Only suggest titles of this type.
+                Defaults to all types.
+
+        Returns:
+            List[Dict[str, Any]]: Suggestions in descending popularity order
+        """
+        k = self.k if k is None else k
+        if k < 1:
+            raise ValueError(f"Number of results must be positive, got {k}")
+        k = min(k, self.k)
+        # Trailing whitespace is dropped, so that "the matrix " still matches "The Matrix"
+        prefix = normalize_title(query.strip())
+        if not prefix:
+            return []
+        record_types = [record_type] if record_type is not None else list(self.tries)
+        suggestions = []
+        for suggestion_type in record_types:
+            if suggestion_type not in self.tries:
+                continue
+            for suggestion in self.tries[suggestion_type].complete(prefix, k):
+                suggestion["type"] = suggestion_type.name
+                suggestions.append(suggestion)
+        suggestions.sort(key=lambda suggestion: suggestion["popularity"], reverse=True)
+        return suggestions[:k]
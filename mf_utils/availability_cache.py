@@ -0,0 +1,85 @@
+import sys
+import threading
+import time
+
+from collections import OrderedDict
+from mf_representations.enums import RecordType, RapidPlatformInfoCountry
+
+
+class AvailabilityCache:
+    """
+    In-process LRU cache of platform availability keyed by
+    (tmdb_id, RecordType, country). An entry expires after the default
+    freshness window, or earlier when a title leaves one of its platforms,
+    so availability that is known to have expired is never served.
+    The cache is bounded by the estimated memory of its entries.
+    """
+
+    def __init__(
+        self, max_bytes: int = 64 * 1024 * 1024, default_ttl: float = 6 * 60 * 60
+    ) -> None:
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        # key -> (expires_at, size, platform info)
+        self._entries: OrderedDict = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _estimate_size(platform_info: RapidPlatformInfoCountry) -> int:
+        size = sys.getsizeof(platform_info) + sum(
+            sys.getsizeof(value) for value in vars(platform_info).values()
+        )
+        for streaming_info in platform_info.streaming_info or []:
+            size += sys.getsizeof(streaming_info) + sum(
+                sys.getsizeof(value) for value in vars(streaming_info).values()
+            )
+        return size
+
+    def _get_ttl(self, platform_info: RapidPlatformInfoCountry) -> float:
+        leaving_times = [
+            streaming_info.leaving.timestamp()
+            for streaming_info in platform_info.streaming_info or []
+            if streaming_info.leaving is not None
+        ]
+        if not leaving_times:
+            return self.default_ttl
+        return min(self.default_ttl, min(leaving_times) - time.time())
+
+    def get(self, tmdb_id: int, record_type: RecordType, country: str) -> RapidPlatformInfoCountry:
+        key = (tmdb_id, record_type, country)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, size, platform_info = entry
+            if expires_at <= time.time():
+                del self._entries[key]
+                self._total_bytes -= size
+                return None
+            self._entries.move_to_end(key)
+            return platform_info
+
+    def put(
+        self,
+        tmdb_id: int,
+        record_type: RecordType,
+        country: str,
+        platform_info: RapidPlatformInfoCountry,
+    ) -> None:
+        ttl = self._get_ttl(platform_info)
+        if ttl <= 0:
+            return
+        key = (tmdb_id, record_type, country)
+        size = self._estimate_size(platform_info)
+        with self._lock:
+            if key in self._entries:
+                self._total_bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (time.time() + ttl, size, platform_info)
+            self._total_bytes += size
+            while self._total_bytes > self.max_bytes and self._entries:
+                _, (_, evicted_size, _) = self._entries.popitem(last=False)
+                self._total_bytes -= evicted_size
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -0,0 +1,98 @@
+import os
+import json
+import threading
+
+from datetime import date
+from pathlib import Path
+from typing import Dict
+
+from mf_representations.enums import RecordType
+
+
+class IngestCheckpoint:
+    """
+    Durable progress of a daily export ingest. For every record type the
+    checkpoint file stores the export row offset up to which all rows have
+    been committed. Batches may finish out of order, so offsets only advance
+    over contiguous committed ranges.
+    """
+
+    def __init__(self, file_name: Path, export_date: date = None) -> None:
+        self.file_name = Path(file_name)
+        self.export_date = export_date or date.today()
+        self._lock = threading.Lock()
+        self._offsets: Dict[str, int] = {}
+        self._last_tmdb_ids: Dict[str, int] = {}
+        self._completed: Dict[str, bool] = {}
+        # start offset -> (end offset, last tmdb id) of ranges committed out of order
+        self._pending_ranges: Dict[str, Dict[int, tuple]] = {}
+        self._load()
+
+    def _load(self) -> None:
+        if not self.file_name.exists():
+            return
+        with open(self.file_name, "r") as f:
+            checkpoint = json.load(f)
+        # A checkpoint of another export is of no use, since row offsets differ
+        if checkpoint.get("export_date") != self.export_date.isoformat():
+            return
+        self._offsets = checkpoint.get("offsets", {})
+        self._last_tmdb_ids = checkpoint.get("last_tmdb_ids", {})
+        self._completed = checkpoint.get("completed", {})
+
+    def _save(self) -> None:
+        tmp_file_name = self.file_name.with_suffix(".tmp")
+        with open(tmp_file_name, "w") as f:
+            json.dump(
+                {
+                    "export_date": self.export_date.isoformat(),
+                    "offsets": self._offsets,
+                    "last_tmdb_ids": self._last_tmdb_ids,
+                    "completed": self._completed,
+                },
+                f,
+            )
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file_name, self.file_name)
+
+    def get_offset(self, record_type: RecordType) -> int:
+        with self._lock:
+            return self._offsets.get(record_type.name, 0)
+
+    def is_completed(self, record_type: RecordType) -> bool:
+        with self._lock:
+            return self._completed.get(record_type.name, False)
+
+    def commit(
+        self, record_type: RecordType, start_offset: int, end_offset: int, last_tmdb_id: int
+    ) -> int:
+        """
+        Marks the export rows [start_offset, end_offset) as committed
+
+        Args:
+            record_type (RecordType): Record type of the export
+            start_offset (int): Offset of the first committed row
+            end_offset (int): Offset after the last committed row
+            last_tmdb_id (int): TMDB id of the last committed row
+
+        Returns:
+            int: Offset up to which all rows are committed
+        """
+        with self._lock:
+            key = record_type.name
+            pending_ranges = self._pending_ranges.setdefault(key, {})
+            pending_ranges[start_offset] = (end_offset, last_tmdb_id)
+            offset = self._offsets.get(key, 0)
+            if offset not in pending_ranges:
+                return offset
+            while offset in pending_ranges:
+                offset, self._last_tmdb_ids[key] = pending_ranges.pop(offset)
+            self._offsets[key] = offset
+            self._save()
+            return offset
+
+    def complete(self, record_type: RecordType) -> None:
+        with self._lock:
+            self._completed[record_type.name] = True
+            self._save()
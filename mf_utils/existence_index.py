@@ -0,0 +1,76 @@
+import threading
+import numpy as np
+
+from collections import defaultdict
+from typing import Dict, Iterable, Set, Tuple
+
+from mf_representations.enums import RecordType
+
+
+class ExistenceIndex:
+    """
+    Compact in-memory membership index of (tmdb_id, RecordType) pairs.
+    Every record type keeps a sorted int32 id array. Newly added ids are
+    buffered in a small set and merged into the array once the buffer grows.
+    """
+
+    MERGE_THRESHOLD = 4096
+
+    def __init__(self) -> None:
+        self._sorted_ids: Dict[RecordType, np.ndarray] = defaultdict(
+            lambda: np.empty(0, dtype=np.int32)
+        )
+        self._pending_ids: Dict[RecordType, Set[int]] = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def bulk_load(self, record_type: RecordType, tmdb_ids: Iterable[int]) -> None:
+        """
+        Replaces the ids of the given record type
+
+        Args:
+            record_type (RecordType): Record type of the ids
+            tmdb_ids (Iterable[int]): All existing TMDB ids of that type
+        """
+        sorted_ids = np.unique(np.fromiter(tmdb_ids, dtype=np.int32))
+        with self._lock:
+            self._sorted_ids[record_type] = sorted_ids
+            self._pending_ids[record_type].clear()
+
+    def _merge_pending(self, record_type: RecordType) -> None:
+        pending_ids = np.fromiter(self._pending_ids[record_type], dtype=np.int32)
+        self._sorted_ids[record_type] = np.union1d(self._sorted_ids[record_type], pending_ids)
+        self._pending_ids[record_type].clear()
+
+    def _in_sorted(self, record_type: RecordType, tmdb_id: int) -> bool:
+        sorted_ids = self._sorted_ids[record_type]
+        position = np.searchsorted(sorted_ids, tmdb_id)
+        return position < len(sorted_ids) and sorted_ids[position] == tmdb_id
+
+    def add(self, record_type: RecordType, tmdb_id: int) -> None:
+        with self._lock:
+            if self._in_sorted(record_type, tmdb_id):
+                return
+            self._pending_ids[record_type].add(tmdb_id)
+            if len(self._pending_ids[record_type]) >= self.MERGE_THRESHOLD:
+                self._merge_pending(record_type)
+
+    def remove(self, record_type: RecordType, tmdb_id: int) -> None:
+        with self._lock:
+            self._pending_ids[record_type].discard(tmdb_id)
+            sorted_ids = self._sorted_ids[record_type]
+            position = np.searchsorted(sorted_ids, tmdb_id)
+            if position < len(sorted_ids) and sorted_ids[position] == tmdb_id:
+                self._sorted_ids[record_type] = np.delete(sorted_ids, position)
+
+    def __contains__(self, key: Tuple[int, RecordType]) -> bool:
+        tmdb_id, record_type = key
+        with self._lock:
+            return tmdb_id in self._pending_ids[record_type] or self._in_sorted(
+                record_type, tmdb_id
+            )
+
+    def __len__(self) -> int:
+        with self._lock:
+            return sum(len(ids) for ids in self._sorted_ids.values()) + sum(
+                len(ids) for ids in self._pending_ids.values()
+            )
@@ -0,0 +1,95 @@
+import orjson
+import numpy as np
+
+from typing import List
+
+from mf_representations.enums import TmdbExportColumns
+
+
+def _to_columns(objects: list, title_key: str) -> TmdbExportColumns:
+    columns = TmdbExportColumns()
+    tmdb_ids, titles, popularity = [], [], []
+    for obj in objects:
+        try:
+            tmdb_id, title, obj_popularity = obj["id"], obj[title_key], obj["popularity"]
+        except (KeyError, TypeError):
+            columns.num_malformed += 1
+            continue
+        tmdb_ids.append(tmdb_id)
+        titles.append(title or "")
+        popularity.append(obj_popularity)
+    try:
+        columns.tmdb_ids = np.array(tmdb_ids, dtype=np.int32)
+        columns.popularity = np.array(popularity, dtype=np.float64)
+    except (TypeError, ValueError, OverflowError):
+        # A single value of the wrong type fails the whole batch conversion,
+        # so only then the values are checked one by one
+        return _to_columns_checked(objects, title_key)
+    columns.titles = titles
+    return columns
+
+
+def _to_columns_checked(objects: list, title_key: str) -> TmdbExportColumns:
+    columns = TmdbExportColumns()
+    tmdb_ids, titles, popularity = [], [], []
+    for obj in objects:
+        try:
+            tmdb_id = np.int32(obj["id"])
+            title = obj[title_key] or ""
+            obj_popularity = np.float64(obj["popularity"])
+        except (KeyError, TypeError, ValueError, OverflowError):
+            columns.num_malformed += 1
+            continue
+        tmdb_ids.append(tmdb_id)
+        titles.append(title)
+        popularity.append(obj_popularity)
+    columns.tmdb_ids = np.array(tmdb_ids, dtype=np.int32)
+    columns.titles = titles
+    columns.popularity = np.array(popularity, dtype=np.float64)
+    return columns
+
+
+def parse_export_lines(lines: List[bytes], title_key: str) -> TmdbExportColumns:
+    """
+    Parses a batch of TMDB export lines into typed columns. The batch is decoded
+    with a single orjson call, and only if that fails the lines are decoded one by
+    one to find and count the malformed ones.
+
+    Args:
+        lines (List[bytes]): Raw json lines of the export
+        title_key (str): Title key of the export rows, e.g. "original_title"
+
+    Returns:
+        TmdbExportColumns: Parsed columns and the number of malformed lines
+    """
+    lines = [line for line in lines if line.strip()]
+    num_undecodable = 0
+    try:
+        objects = orjson.loads(b"[" + b",".join(lines) + b"]")
+        if len(objects) != len(lines):
+            raise orjson.JSONDecodeError("Line count mismatch", "", 0)
+    except orjson.JSONDecodeError:
+        objects = []
+        for line in lines:
+            try:
+                objects.append(orjson.loads(line))
+            except orjson.JSONDecodeError:
+                num_undecodable += 1
+    columns = _to_columns(objects, title_key)
+    columns.num_malformed += num_undecodable
+    return columns
+
+
+def parse_export_chunk(chunk: bytes, title_key: str) -> TmdbExportColumns:
+    """
+    Parses a chunk of whole TMDB export lines. Kept at module level so that
+    it can be sent to a process pool.
+
+    Args:
+        chunk (bytes): Newline separated json lines of the export
+        title_key (str): Title key of the export rows, e.g. "original_title"
+
+    Returns:
+        TmdbExportColumns: Parsed columns and the number of malformed lines
+    """
+    return parse_export_lines(chunk.split(b"\n"), title_key)
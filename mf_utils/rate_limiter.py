@@ -0,0 +1,157 @@
+import asyncio
+import threading
+import time
+
+from email.utils import parsedate_to_datetime
+from typing import Dict, Mapping
+
+from mf_representations.enums import UpstreamType
+
+
+class QuotaExhaustedError(Exception):
+    """
+    Raised when the request quota of an upstream API has been used up
+    """
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket rate limiter. Tokens are reserved ahead of time,
+    so callers only wait for their own slot and bursts from several threads
+    are spread out at the configured rate. The bucket adapts to Retry-After
+    and rate limit response headers.
+    """
+
+    REMAINING_HEADERS = (
+        "X-RateLimit-Remaining",
+        "X-RateLimit-Requests-Remaining",
+    )
+    RESET_HEADERS = (
+        "X-RateLimit-Reset",
+        "X-RateLimit-Requests-Reset",
+    )
+
+    def __init__(self, rate: float, capacity: float) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self) -> float:
+        """
+        Reserves a single token
+
+        Returns:
+            float: Seconds to wait before the reserved token may be used
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._tokens -= 1
+            return max(0.0, self._paused_until - now) + max(0.0, -self._tokens) / self.rate
+
+    def acquire(self) -> None:
+        wait_time = self.reserve()
+        if wait_time > 0:
+            time.sleep(wait_time)
+
+    async def acquire_async(self) -> None:
+        wait_time = self.reserve()
+        if wait_time > 0:
+            await asyncio.sleep(wait_time)
+
+    def pause(self, seconds: float) -> None:
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    @staticmethod
+    def _parse_seconds(value: str) -> float:
+        # Header values are either delta seconds, epoch seconds or HTTP dates
+        try:
+            seconds = float(value)
+        except ValueError:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        if seconds > 10**9:
+            return max(0.0, seconds - time.time())
+        return seconds
+
+    def update_from_headers(self, status_code: int, headers: Mapping[str, str]) -> None:
+        """
+        Adapts the bucket to the rate limit information of an upstream response
+
+        Args:
+            status_code (int): HTTP status code of the response
+            headers (Mapping[str, str]): Response headers
+        """
+        try:
+            retry_after = headers.get("Retry-After")
+            if status_code == 429 and retry_after is not None:
+                self.pause(self._parse_seconds(retry_after))
+            remaining = next(
+                (headers[name] for name in self.REMAINING_HEADERS if name in headers), None
+            )
+            if remaining is None:
+                return
+            with self._lock:
+                self._tokens = min(self._tokens, float(remaining))
+            reset = next((headers[name] for name in self.RESET_HEADERS if name in headers), None)
+            if float(remaining) <= 0 and reset is not None:
+                self.pause(self._parse_seconds(reset))
+        except (ValueError, TypeError):
+            return
+
+
+# Upstream -> (requests per second, burst capacity)
+UPSTREAM_RATE_LIMITS = {
+    UpstreamType.TMDB: (40.0, 40),
+    UpstreamType.RAPID: (10.0, 10),
+    UpstreamType.SUPABASE: (100.0, 100),
+}
+
+_rate_limiters: Dict[UpstreamType, TokenBucket] = {}
+_rate_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(upstream: UpstreamType) -> TokenBucket:
+    """
+    Function for getting the token bucket shared by all connectors of an upstream
+
+    Args:
+        upstream (UpstreamType): Upstream API
+
+    Returns:
+        TokenBucket: Shared rate limiter of the upstream
+    """
+    with _rate_limiters_lock:
+        if upstream not in _rate_limiters:
+            _rate_limiters[upstream] = TokenBucket(*UPSTREAM_RATE_LIMITS[upstream])
+        return _rate_limiters[upstream]
+
+
+class AsyncQuotaLimiter:
+    """
+    Asyncio limiter that takes its pace from a shared token bucket and stops
+    granting requests once the remaining quota reaches zero. The remaining
+    quota can be corrected from the upstream rate limit response headers.
+    """
+
+    def __init__(self, rate_limiter: TokenBucket, quota: int = None) -> None:
+        self.rate_limiter = rate_limiter
+        self.remaining = quota
+
+    async def acquire(self) -> None:
+        if self.remaining is not None:
+            if self.remaining <= 0:
+                raise QuotaExhaustedError("Request quota exhausted")
+            self.remaining -= 1
+        await self.rate_limiter.acquire_async()
+
+    def update_remaining(self, remaining: int) -> None:
+        if self.remaining is None or remaining < self.remaining:
+            self.remaining = remaining
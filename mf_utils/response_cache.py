@@ -0,0 +1,110 @@
+import sqlite3
+import threading
+import time
+
+from dataclasses import dataclass
+from pathlib import Path
+
+
+@dataclass
+class CachedResponse:
+    body: bytes
+    etag: str
+    last_modified: str
+    expires_at: float
+
+    @property
+    def is_fresh(self) -> bool:
+        return self.expires_at > time.time()
+
+
+class ResponseCache:
+    """
+    Persistent SQLite cache of HTTP response bodies with their validators.
+    Entries expire after a per-request TTL and can then be revalidated with
+    a conditional request. The cache is bounded in size and evicts the least
+    recently used entries first. WAL mode lets several processes share the file.
+    """
+
+    EVICTION_BATCH_SIZE = 100
+
+    def __init__(self, file_name: Path, max_bytes: int = 256 * 1024 * 1024) -> None:
+        self.file_name = Path(file_name)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(
+            self.file_name, check_same_thread=False, isolation_level=None
+        )
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                body BLOB NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                expires_at REAL NOT NULL,
+                last_access REAL NOT NULL,
+                size INTEGER NOT NULL
+            )
+            """
+        )
+        self._connection.execute(
+            "CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access)"
+        )
+        self._total_bytes = self._get_total_bytes()
+
+    def _get_total_bytes(self) -> int:
+        return self._connection.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def get(self, key: str) -> CachedResponse:
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT body, etag, last_modified, expires_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._connection.execute(
+                "UPDATE responses SET last_access = ? WHERE key = ?", (time.time(), key)
+            )
+        return CachedResponse(*row)
+
+    def put(self, key: str, body: bytes, etag: str, last_modified: str, ttl: float) -> None:
+        now = time.time()
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, body, etag, last_modified, now + ttl, now, len(body)),
+            )
+            self._total_bytes += len(body)
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def refresh(self, key: str, ttl: float) -> None:
+        """
+        Extends the expiry of an entry after a successful revalidation
+        """
+        now = time.time()
+        with self._lock:
+            self._connection.execute(
+                "UPDATE responses SET expires_at = ?, last_access = ? WHERE key = ?",
+                (now + ttl, now, key),
+            )
+
+    def _evict(self) -> None:
+        # The running total drifts with replaced entries and other processes,
+        # so it is recomputed before evicting
+        self._total_bytes = self._get_total_bytes()
+        while self._total_bytes > self.max_bytes:
+            rows = self._connection.execute(
+                "SELECT key, size FROM responses ORDER BY last_access LIMIT ?",
+                (self.EVICTION_BATCH_SIZE,),
+            ).fetchall()
+            if not rows:
+                break
+            for key, size in rows:
+                self._connection.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._total_bytes -= size
+                if self._total_bytes <= self.max_bytes:
+                    break
@@ -0,0 +1,233 @@
+import math
+import unicodedata
+import numpy as np
+import pandas as pd
+
+from pathlib import Path
+from typing import List, Dict, Any
+
+from mf_representations.enums import RecordType
+
+RECORD_TYPES = list(RecordType)
+
+# Maps ASCII punctuation to spaces for the fast ASCII normalization path
+_ASCII_PUNCTUATION_TABLE = str.maketrans(
+    {chr(code): " " for code in range(128) if not chr(code).isalnum()}
+)
+
+
+def normalize_title(title: str) -> str:
+    """
+    Function for normalizing titles before indexing and searching: strips
+    accents, lowercases and replaces punctuation with single spaces
+
+    Args:
+        title (str): Title to normalize
+
+    Returns:
+        str: Normalized title
+    """
+    if title.isascii():
+        return " ".join(title.lower().translate(_ASCII_PUNCTUATION_TABLE).split())
+    title = unicodedata.normalize("NFKD", title)
+    title = "".join(char for char in title if not unicodedata.combining(char)).lower()
+    return " ".join("".join(char if char.isalnum() else " " for char in title).split())
+
+
+def _pad_title(normalized_title: str) -> str:
+    # Padding makes the word boundaries part of the trigrams
+    return f"  {normalized_title} "
+
+
+def _encode_trigrams(code_points: np.ndarray) -> np.ndarray:
+    # Packs three 21 bit unicode code points into one int64 trigram code
+    code_points = code_points.astype(np.int64)
+    return (code_points[:-2] << 42) | (code_points[1:-1] << 21) | code_points[2:]
+
+
+def _to_code_points(text: str) -> np.ndarray:
+    return np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32)
+
+
+def get_trigram_codes(normalized_title: str) -> np.ndarray:
+    """
+    Function for getting the sorted unique trigram codes of a normalized title
+
+    Args:
+        normalized_title (str): Title normalized with normalize_title
+
+    Returns:
+        np.ndarray: Sorted int64 trigram codes
+    """
+    return np.unique(_encode_trigrams(_to_code_points(_pad_title(normalized_title))))
+
+
+def load_export(file_name: Path) -> pd.DataFrame:
+    """
+    Function for loading the id/title export written by TmdbExporter.export_all_id_titles
+
+    Args:
+        file_name (Path): Pipe separated CSV or Parquet export
+
+    Returns:
+        pd.DataFrame: Export with tmdb_id, title, popularity and type columns
+    """
+    file_name = Path(file_name)
+    columns = ["tmdb_id", "title", "popularity", "type"]
+    if file_name.suffix == ".parquet":
+        return pd.read_parquet(file_name, columns=columns)
+    return pd.read_csv(file_name, sep="|", usecols=columns, keep_default_na=False)
+
+
+class TrigramIndex:
+    """
+    In-memory trigram inverted index over normalized titles. Posting lists
+    are stored as one int32 array of document numbers with an offsets array
+    per trigram. Matches are ranked by a mix of trigram similarity and
+    popularity, which makes the search tolerant to typos.
+    """
+
+    # Trigrams in more than this share of titles only add noise and latency
+    MAX_POSTING_SHARE = 0.1
+    MIN_SIMILARITY = 0.2
+
+    def __init__(
+        self,
+        tmdb_ids: np.ndarray,
+        titles: List[str],
+        popularity: np.ndarray,
+        record_types: np.ndarray,
+    ) -> None:
+        self.tmdb_ids = np.asarray(tmdb_ids, dtype=np.int32)
+        self.titles = titles
+        self.popularity = np.asarray(popularity, dtype=np.float32)
+        # Index of the record type in RecordType
+        self.record_types = np.asarray(record_types, dtype=np.int8)
+        self._popularity_score = np.log1p(np.maximum(self.popularity, 0)) / max(
+            math.log1p(float(self.popularity.max(initial=0))), 1e-6
+        )
+        self._build()
+
+    def _build(self) -> None:
+        # All padded titles are concatenated into one code point array, so that
+        # trigrams of every title are encoded and grouped with vectorized operations
+        padded_titles = [_pad_title(normalize_title(title)) for title in self.titles]
+        lengths = np.fromiter(map(len, padded_titles), dtype=np.int64, count=len(padded_titles))
+        starts = np.zeros(len(lengths), dtype=np.int64)
+        np.cumsum(lengths[:-1], out=starts[1:])
+        codes = _encode_trigrams(_to_code_points("".join(padded_titles)))
+        del padded_titles
+
+        docs = np.repeat(np.arange(len(lengths), dtype=np.int32), lengths)[: len(codes)]
+        # Drops the trigrams that span two titles
+        valid = np.arange(len(codes)) - starts[docs] <= lengths[docs] - 3
+        docs, codes = docs[valid], codes[valid]
+
+        # Sorts by (trigram, document) and drops trigrams repeated within a title
+        order = np.lexsort((docs, codes))
+        docs, codes = docs[order], codes[order]
+        unique = np.ones(len(codes), dtype=bool)
+        unique[1:] = (codes[1:] != codes[:-1]) | (docs[1:] != docs[:-1])
+        docs, codes = docs[unique], codes[unique]
+
+        self.gram_codes, gram_starts = np.unique(codes, return_index=True)
+        self.offsets = np.append(gram_starts, len(codes)).astype(np.int64)
+        self.postings = docs
+        self.gram_counts = np.bincount(docs, minlength=len(lengths)).astype(np.int32)
+
+    def _lookup_gram_ids(self, query_codes: np.ndarray) -> np.ndarray:
+        positions = np.searchsorted(self.gram_codes, query_codes)
+        positions = np.minimum(positions, len(self.gram_codes) - 1)
+        return positions[self.gram_codes[positions] == query_codes]
+
+    @classmethod
+    def from_export(cls, file_name: Path) -> "TrigramIndex":
+        df = load_export(file_name)
+        type_codes = {record_type.name: code for code, record_type in enumerate(RECORD_TYPES)}
+        return cls(
+            tmdb_ids=df["tmdb_id"].to_numpy(),
+            titles=df["title"].astype(str).tolist(),
+            popularity=df["popularity"].to_numpy(),
+            record_types=df["type"].astype(str).map(type_codes).to_numpy(),
+        )
+
+    @classmethod
+    def from_title_store(cls, title_store: "TitleStore") -> "TrigramIndex":
+        tmdb_ids, titles, popularity, record_types = title_store.get_columns()
+        return cls(
+            tmdb_ids=tmdb_ids, titles=titles, popularity=popularity, record_types=record_types
+        )
+
+    def search(
+        self,
+        query: str,
+        k: int = 10,
+        record_type: RecordType = None,
+        popularity_weight: float = 0.3,
+    ) -> List[Dict[str, Any]]:
+        """
+        Returns the top-k titles matching the query
+
+        Args:
+            query (str): Search text
+            k (int, optional): Number of results. Defaults to 10.
+            record_type (RecordType, optional): Only return titles of this type.
+                Defaults to all types.
+            popularity_weight (float, optional): Weight of the normalized popularity
+                in the score, next to the trigram similarity. Defaults to 0.3.
+
+        Returns:
+            List[Dict[str, Any]]: Matches in descending score order
+        """
+        if k < 1:
+            raise ValueError(f"Number of results must be positive, got {k}")
+        query_codes = get_trigram_codes(normalize_title(query))
+        codes = (
+            self._lookup_gram_ids(query_codes) if len(self.gram_codes) else np.empty(0, np.int64)
+        )
+        if len(codes) == 0:
+            return []
+        # Only the selective trigrams are used to collect candidates, but every
+        # candidate is scored against all query trigrams, so that a typo which
+        # leaves only common trigrams intact still matches
+        max_posting_length = max(self.MAX_POSTING_SHARE * len(self.titles), 1)
+        posting_lengths = self.offsets[codes + 1] - self.offsets[codes]
+        selective_codes = codes[posting_lengths <= max_posting_length]
+        # Postings are unique within a trigram, so the shared trigrams are counted
+        # with plain fancy indexing over dense per-title arrays
+        is_candidate = np.zeros(len(self.titles), dtype=bool)
+        for code in selective_codes if len(selective_codes) else codes:
+            is_candidate[self.postings[self.offsets[code] : self.offsets[code + 1]]] = True
+        shared_counts = np.zeros(len(self.titles), dtype=np.int16)
+        for code in codes:
+            shared_counts[self.postings[self.offsets[code] : self.offsets[code + 1]]] += 1
+        # The similarity is at most the containment, which bounds the shared count
+        min_shared = math.ceil(self.MIN_SIMILARITY * len(query_codes))
+        docs = np.flatnonzero(is_candidate & (shared_counts >= min_shared))
+        shared = shared_counts[docs]
+        # Jaccard similarity favors titles of the query's length, and containment
+        # of the query trigrams keeps long titles with a single typo ranked
+        jaccard = shared / (len(query_codes) + self.gram_counts[docs] - shared)
+        containment = shared / len(query_codes)
+        similarity = (jaccard + containment) / 2
+        mask = similarity >= self.MIN_SIMILARITY
+        if record_type is not None:
+            mask &= self.record_types[docs] == RECORD_TYPES.index(record_type)
+        docs, similarity = docs[mask], similarity[mask]
+        scores = (1 - popularity_weight) * similarity + popularity_weight * self._popularity_score[
+            docs
+        ]
+        if len(docs) > k:
+            top = np.argpartition(-scores, k)[:k]
+            docs, scores = docs[top], scores[top]
+        order = np.argsort(-scores, kind="stable")
+        return [
+            {
+                "tmdb_id": int(self.tmdb_ids[doc]),
+                "title": self.titles[doc],
+                "type": RECORD_TYPES[self.record_types[doc]].name,
+                "popularity": float(self.popularity[doc]),
+                "score": float(score),
+            }
+            for doc, score in zip(docs[order], scores[order])
+        ]
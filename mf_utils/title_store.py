@@ -0,0 +1,171 @@
+import mmap
+import struct
+import sys
+import numpy as np
+
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+from mf_representations.enums import RecordType
+from mf_utils.title_search import load_export
+
+MAGIC = b"MFTS"
+VERSION = 1
+STORE_RECORD_TYPES = (RecordType.MOVIE, RecordType.SERIES, RecordType.ARTIST)
+
+# magic, version, number of sections
+_HEADER = struct.Struct("<4sII")
+# record type index, count, ids offset, popularity offset, title offsets offset, blob offset
+_SECTION = struct.Struct("<IQQQQQ")
+
+
+def _align(offset: int, alignment: int = 8) -> int:
+    return (offset + alignment - 1) // alignment * alignment
+
+
+def build_title_store(export_file_name: Path, store_file_name: Path) -> Path:
+    """
+    Function for writing the id/title export into the binary title store format.
+    Every record type gets a sorted int32 id array, a float32 popularity array,
+    a uint64 title offsets array and one UTF-8 title blob.
+
+    Args:
+        export_file_name (Path): CSV or Parquet export of TmdbExporter.export_all_id_titles
+        store_file_name (Path): Path of the store to write
+
+    Returns:
+        Path: Path of the written store
+    """
+    df = load_export(export_file_name)
+    sections = []
+    for record_type in STORE_RECORD_TYPES:
+        type_df = df[df["type"].astype(str) == record_type.name].sort_values("tmdb_id")
+        type_df = type_df.drop_duplicates("tmdb_id")
+        encoded_titles = [title.encode("utf-8") for title in type_df["title"].astype(str)]
+        title_offsets = np.zeros(len(encoded_titles) + 1, dtype=np.uint64)
+        np.cumsum([len(title) for title in encoded_titles], out=title_offsets[1:])
+        sections.append(
+            (
+                record_type,
+                type_df["tmdb_id"].to_numpy(dtype=np.int32),
+                type_df["popularity"].to_numpy(dtype=np.float32),
+                title_offsets,
+                b"".join(encoded_titles),
+            )
+        )
+
+    store_file_name = Path(store_file_name)
+    tmp_file_name = store_file_name.with_suffix(".tmp")
+    with open(tmp_file_name, "wb") as f:
+        offset = _align(_HEADER.size + _SECTION.size * len(sections))
+        descriptors, payloads = [], []
+        for record_type, ids, popularity, title_offsets, blob in sections:
+            section_offsets = []
+            for payload in (ids.tobytes(), popularity.tobytes(), title_offsets.tobytes(), blob):
+                section_offsets.append(offset)
+                payloads.append((offset, payload))
+                offset = _align(offset + len(payload))
+            descriptors.append(
+                _SECTION.pack(STORE_RECORD_TYPES.index(record_type), len(ids), *section_offsets)
+            )
+        f.write(_HEADER.pack(MAGIC, VERSION, len(sections)))
+        for descriptor in descriptors:
+            f.write(descriptor)
+        for payload_offset, payload in payloads:
+            f.seek(payload_offset)
+            f.write(payload)
+    tmp_file_name.replace(store_file_name)
+    return store_file_name
+
+
+class TitleStore:
+    """
+    Read-only memory-mapped title store written by build_title_store. All
+    arrays are views on the mapping, so processes that open the same file
+    share one page cache copy and nothing is deserialized. Lookups are a
+    binary search over the sorted ids of a record type.
+    """
+
+    def __init__(self, file_name: Path) -> None:
+        self.file_name = Path(file_name)
+        with open(self.file_name, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, num_sections = _HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{self.file_name} is not a version {VERSION} title store")
+        # record type -> (ids, popularity, title offsets, blob offset)
+        self._sections: Dict[RecordType, Tuple[np.ndarray, np.ndarray, np.ndarray, int]] = {}
+        for section in range(num_sections):
+            type_index, count, ids_offset, popularity_offset, offsets_offset, blob_offset = (
+                _SECTION.unpack_from(self._mmap, _HEADER.size + section * _SECTION.size)
+            )
+            self._sections[STORE_RECORD_TYPES[type_index]] = (
+                np.frombuffer(self._mmap, dtype=np.int32, count=count, offset=ids_offset),
+                np.frombuffer(
+                    self._mmap, dtype=np.float32, count=count, offset=popularity_offset
+                ),
+                np.frombuffer(self._mmap, dtype=np.uint64, count=count + 1, offset=offsets_offset),
+                blob_offset,
+            )
+
+    def __len__(self) -> int:
+        return sum(len(section[0]) for section in self._sections.values())
+
+    def _find(self, record_type: RecordType, tmdb_id: int) -> int:
+        ids = self._sections[record_type][0]
+        position = int(np.searchsorted(ids, tmdb_id))
+        if position < len(ids) and ids[position] == tmdb_id:
+            return position
+        return -1
+
+    def _get_title_at(self, record_type: RecordType, position: int) -> str:
+        _, _, title_offsets, blob_offset = self._sections[record_type]
+        start = blob_offset + int(title_offsets[position])
+        end = blob_offset + int(title_offsets[position + 1])
+        return self._mmap[start:end].decode("utf-8")
+
+    def get_title(self, record_type: RecordType, tmdb_id: int) -> str:
+        if record_type not in self._sections:
+            return None
+        position = self._find(record_type, tmdb_id)
+        return self._get_title_at(record_type, position) if position >= 0 else None
+
+    def get_popularity(self, record_type: RecordType, tmdb_id: int) -> float:
+        if record_type not in self._sections:
+            return None
+        position = self._find(record_type, tmdb_id)
+        return float(self._sections[record_type][1][position]) if position >= 0 else None
+
+    def get_columns(self) -> Tuple[np.ndarray, List[str], np.ndarray, np.ndarray]:
+        """
+        Returns the ids, titles, popularities and record type indexes in
+        RecordType of all titles, e.g. for building the search indexes
+
+        Returns:
+            Tuple[np.ndarray, List[str], np.ndarray, np.ndarray]: Store columns
+        """
+        ids, titles, popularity, record_types = [], [], [], []
+        for record_type, (type_ids, type_popularity, title_offsets, blob_offset) in (
+            self._sections.items()
+        ):
+            blob = self._mmap[blob_offset : blob_offset + int(title_offsets[-1])]
+            offset_list = title_offsets.tolist()
+            titles.extend(
+                blob[start:end].decode("utf-8")
+                for start, end in zip(offset_list[:-1], offset_list[1:])
+            )
+            ids.append(type_ids)
+            popularity.append(type_popularity)
+            record_types.append(
+                np.full(len(type_ids), list(RecordType).index(record_type), dtype=np.int8)
+            )
+        return (
+            np.concatenate(ids) if ids else np.empty(0, dtype=np.int32),
+            titles,
+            np.concatenate(popularity) if popularity else np.empty(0, dtype=np.float32),
+            np.concatenate(record_types) if record_types else np.empty(0, dtype=np.int8),
+        )
+
+
+if __name__ == "__main__":
+    build_title_store(Path(sys.argv[1]), Path(sys.argv[2]))
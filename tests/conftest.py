@@ -0,0 +1,6 @@
+import os
+import tempfile
+
+# Modules create the file logger on import, so the log directory is set before
+# the test modules are collected, keeping the log file out of the working tree
+os.environ.setdefault("MOVIE_FINDER_LOG", tempfile.mkdtemp(prefix="movie_finder_logs_"))
@@ -0,0 +1,103 @@
+"""
+Local stub of the RapidAPI streaming availability /get/basic endpoint. Point
+RapidConnector at it with RAPID_BASE_URL.
+
+Usage:
+    python tests/rapid_stub.py [port]
+"""
+import sys
+import threading
+import time
+import logging
+
+from flask import Flask, request, jsonify
+from werkzeug.serving import make_server
+from typing import Dict, List, Set, Tuple
+
+
+class RapidStub:
+    """
+    Serves /get/basic with one streaming entry per country in COUNTRIES.
+    Requests are recorded in calls, ids in failing_ids answer with a 500,
+    and the first throttled_calls requests of each id answer with a 429.
+    """
+
+    COUNTRIES = ("us", "de")
+
+    def __init__(self, port: int = 0) -> None:
+        self.calls: List[Tuple[int, str, int]] = []
+        self.failing_ids: Set[int] = set()
+        self.throttled_calls = 0
+        # tmdb_id -> leaving epoch time on every platform, 0 if not leaving
+        self.leaving: Dict[int, int] = {}
+        self._lock = threading.Lock()
+        self.app = Flask(__name__)
+        self.app.add_url_rule("/get/basic", view_func=self._get_basic)
+        logging.getLogger("werkzeug").setLevel(logging.ERROR)
+        self._server = make_server("127.0.0.1", port, self.app, threaded=True)
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_port}"
+
+    def _get_basic(self):
+        tmdb_id = int(request.args["tmdb_id"].split("/")[1])
+        with self._lock:
+            num_calls = sum(1 for call in self.calls if call[0] == tmdb_id)
+            if tmdb_id in self.failing_ids:
+                status = 500
+            elif num_calls < self.throttled_calls:
+                status = 429
+            else:
+                status = 200
+            self.calls.append((tmdb_id, request.args.get("country"), status))
+        if status == 500:
+            return jsonify({"message": "Internal error"}), 500
+        if status == 429:
+            return jsonify({"message": "Too many requests"}), 429, {"Retry-After": "0"}
+        leaving = self.leaving.get(tmdb_id, 0)
+        return jsonify(
+            {
+                "imdbID": f"tt{tmdb_id}",
+                "imdbRating": 70,
+                "imdbVoteCount": 1000,
+                "tmdbID": str(tmdb_id),
+                "tmdbRating": 70,
+                "title": f"Title {tmdb_id}",
+                "genres": [18],
+                "countries": ["US"],
+                "year": 2000,
+                "runtime": 100,
+                "cast": [],
+                "significants": [],
+                "overview": "",
+                "tagline": "",
+                "age": 12,
+                "streamingInfo": {
+                    "netflix": {
+                        country: {
+                            "link": f"https://www.netflix.com/title/{tmdb_id}",
+                            "added": int(time.time()) - 86400,
+                            "leaving": leaving,
+                        }
+                        for country in self.COUNTRIES
+                    }
+                },
+            }
+        )
+
+    def start(self) -> "RapidStub":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._thread.join()
+
+
+if __name__ == "__main__":
+    stub = RapidStub(int(sys.argv[1]) if len(sys.argv) > 1 else 8765)
+    print(f"RapidAPI stub listening on {stub.url}")
+    stub._server.serve_forever()
@@ -0,0 +1,111 @@
+from collections import Counter
+
+import pytest
+
+from db_connector.availability_store import AvailabilityStore
+from db_connector.rapid_connector import RapidConnector
+from db_connector.refresh_scheduler import AvailabilityRefreshScheduler
+from mf_representations.enums import AvailabilityRefreshItem, RecordType
+from rapid_stub import RapidStub
+
+START_TIME = 1_700_000_000.0
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = START_TIME
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.now += seconds
+
+
+@pytest.fixture
+def stub(monkeypatch):
+    stub = RapidStub().start()
+    monkeypatch.setenv("RAPID_BASE_URL", stub.url)
+    monkeypatch.setenv("RAPID_KEY", "stub-key")
+    yield stub
+    stub.stop()
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def scheduler(stub, clock, tmp_path):
+    return AvailabilityRefreshScheduler(
+        RapidConnector(),
+        AvailabilityStore(tmp_path / "availability.sqlite"),
+        daily_budget=48,
+        clock=clock,
+        sleep=clock.sleep,
+    )
+
+
+def _items(popularities):
+    return [
+        AvailabilityRefreshItem(tmdb_id, RecordType.MOVIE, "us", popularity)
+        for tmdb_id, popularity in popularities.items()
+    ]
+
+
+def test_refreshes_by_popularity_and_spreads_requests(scheduler, stub, clock):
+    scheduler.add_many(_items({1: 1.0, 2: 100.0, 3: 10.0}))
+    scheduler.run(max_slots=3)
+    assert [call[0] for call in stub.calls] == [2, 3, 1]
+    # One request per 30 minutes with a budget of 48 per day
+    assert clock.now - START_TIME == pytest.approx(2 * 30 * 60)
+
+
+def test_recently_refreshed_items_are_not_due(scheduler, stub, clock):
+    scheduler.add_many(_items({1: 1.0, 2: 100.0}))
+    scheduler.run(max_slots=10)
+    assert len(stub.calls) == 2
+    # Both items are due again once MIN_REFRESH_INTERVAL has passed
+    clock.now += scheduler.MIN_REFRESH_INTERVAL
+    scheduler.run(max_slots=2)
+    assert len(stub.calls) == 4
+
+
+def test_other_countries_are_filled_by_the_same_response(scheduler, stub):
+    scheduler.add_many(
+        [
+            AvailabilityRefreshItem(1, RecordType.MOVIE, "us", 10.0),
+            AvailabilityRefreshItem(1, RecordType.MOVIE, "de", 10.0),
+        ]
+    )
+    scheduler.run(max_slots=4)
+    assert len(stub.calls) == 1
+
+
+def test_failing_item_backs_off(scheduler, stub):
+    stub.failing_ids.add(1)
+    scheduler.add_many(_items({1: 1000.0, 2: 1.0, 3: 1.0, 4: 1.0}))
+    scheduler.run(max_slots=20)
+    calls = Counter(call[0] for call in stub.calls)
+    assert calls[2] == calls[3] == calls[4] == 1
+    assert calls[1] <= 6
+    assert scheduler.num_failed == calls[1]
+
+
+def test_every_upstream_call_counts_against_the_budget(scheduler, stub, clock):
+    stub.throttled_calls = 1
+    scheduler.add_many(_items({1: 1.0, 2: 1.0}))
+    scheduler.run(max_slots=2)
+    assert [call[2] for call in stub.calls] == [429, 200, 429, 200]
+    assert scheduler.num_requests == len(stub.calls)
+    # The first slot made two calls, so the second one starts an hour later
+    assert clock.now - START_TIME == pytest.approx(60 * 60)
+
+
+def test_server_errors_are_not_retried_by_the_session(scheduler, stub):
+    stub.failing_ids.add(1)
+    scheduler.add_many(_items({1: 1.0}))
+    scheduler.run(max_slots=1)
+    assert len(stub.calls) == 1
+    assert scheduler.num_requests == 1